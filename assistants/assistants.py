@@ -7,18 +7,68 @@ import sounddevice as sd
 import wave
 import os
 import json
+import threading
 from datetime import datetime
+from typing import Iterator, Optional, Tuple
 import assemblyai as aai
-from elevenlabs import play
 from elevenlabs.client import ElevenLabs
 from PIL import Image
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from modules.constants import (
     OPENAI_IMG_AGENT_DIR,
+    OPENAI_SUPER_STREAM_TOOL_CALLS,
+    IMAGE_STORE_MAX_VERSIONS,
+    TOOL_CONCURRENCY_LIMITS,
+    TOOL_PLUGIN_MODULES,
     ELEVEN_LABS_CRINGE_VOICE,
     ELEVEN_LABS_PRIMARY_SOLID_VOICE,
+    TTS_PCM_SAMPLE_RATE,
+    OPENAI_PCM_SAMPLE_RATE,
+)
+from modules.constants import (
+    HEDGED_THINK_MODEL_IDS,
+    HEDGE_MODE,
+    HEDGE_RACE_N,
+    HEDGE_PERCENTILE,
+    HEDGE_DEFAULT_DELAY,
+    ROUTER_LLM_MODEL_IDS,
+    OLLAMA_MODEL,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_WARMUP_PROMPT,
+    OLLAMA_REUSE_CONTEXT,
+    OLLAMA_MAX_CONTEXT_TOKENS,
+    OLLAMA_FOLLOW_UP_PROMPT,
+    ROUTER_TIMEOUTS,
+    ROUTER_MAX_RETRIES,
+    ROUTER_RETRY_BACKOFF,
+    ROUTER_BREAKER_FAILURES,
+    ROUTER_BREAKER_COOLDOWN,
+    ROUTER_EXPLORE_RATE,
+)
+from modules.simple_llm import (
+    build_mini_model,
+    build_models_by_alias,
+    build_new_gpt4o,
+    get_model_name,
+    prompt,
+)
+from modules.hedging import hedged_call, latency_tracker, race
+from modules.router import Router
+from modules.audio_player import play_pcm_stream
+from modules.tracing import set_attribute, span, submit_in_context, traced
+from modules.partial_json import parse_partial_json
+from modules.image_store import ImageStore
+from modules import local_llm
+from modules.provider_calls import provider_call, rate_limit
+from modules.tool_registry import (
+    ToolResult,
+    get_tool,
+    load_tool_plugins,
+    register_tool,
+    tool_schemas,
+    tools_prompt,
 )
-from modules.simple_llm import build_mini_model, build_new_gpt4o, prompt
 from dotenv import load_dotenv
 import openai
 from groq import Groq
@@ -33,13 +83,33 @@ from modules.typings import (
 )
 
 
+# Guards the *_time_table.json read-modify-write when assistants run on threads (batch mode)
+_time_table_lock = threading.Lock()
+
+
 class PersonalAssistantFramework(abc.ABC):
+    # True when the assistant can carry conversation state itself. main then
+    # keeps one new_conversation() and passes it to think() with the latest
+    # input, so the full prompt is only needed when that state starts over
+    manages_history = False
+    # Which provider handles each stage - used to bound concurrency per provider
+    stt_provider = "openai"
+    llm_provider = "openai"
+    tts_provider = "openai"
+    # File extension of the bytes returned by generate_voice_audio(), callers
+    # that save them should use generate_voice_audio_with_format()
+    voice_audio_format = "mp3"
+    # Sample rate of the PCM stream_voice_audio() yields, callers that play it
+    # should use stream_voice_audio_with_rate()
+    pcm_sample_rate = TTS_PCM_SAMPLE_RATE
+
     @staticmethod
     def timeit_decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             start_time = time.time()
-            result = func(*args, **kwargs)
+            with span(f"{args[0].__class__.__name__}.{func.__name__}"):
+                result = func(*args, **kwargs)
             end_time = time.time()
             duration = round(end_time - start_time, 2)
             print(
@@ -48,41 +118,48 @@ class PersonalAssistantFramework(abc.ABC):
 
             json_file = f"{args[0].__class__.__name__}_time_table.json"
 
-            # Read existing data or create an empty list
-            if os.path.exists(json_file):
-                with open(json_file, "r") as file:
-                    try:
-                        data = json.load(file)
-                    except json.JSONDecodeError:
-                        data = []
-            else:
-                data = []
+            with _time_table_lock:
+                PersonalAssistantFramework._write_time_record(
+                    json_file, args[0].__class__.__name__, func.__name__, duration
+                )
 
-            # Create new time record
-            time_record = {
-                "assistant": args[0].__class__.__name__,
-                "function": func.__name__,
-                "duration": f"{duration:.2f}",
-                "position": 0,  # New entry always at the top
-            }
+            return result
 
-            # Update positions of existing records
-            for record in data:
-                record["position"] += 1
+        return wrapper
 
-            # Insert new record at the beginning
-            data.insert(0, time_record)
+    @staticmethod
+    def _write_time_record(json_file: str, assistant: str, function: str, duration):
+        # Read existing data or create an empty list
+        if os.path.exists(json_file):
+            with open(json_file, "r") as file:
+                try:
+                    data = json.load(file)
+                except json.JSONDecodeError:
+                    data = []
+        else:
+            data = []
 
-            # Sort data by position
-            data.sort(key=lambda x: x["position"])
+        # Create new time record
+        time_record = {
+            "assistant": assistant,
+            "function": function,
+            "duration": f"{duration:.2f}",
+            "position": 0,  # New entry always at the top
+        }
 
-            # Write updated data back to file
-            with open(json_file, "w") as file:
-                json.dump(data, file, indent=2)
+        # Update positions of existing records
+        for record in data:
+            record["position"] += 1
 
-            return result
+        # Insert new record at the beginning
+        data.insert(0, time_record)
 
-        return wrapper
+        # Sort data by position
+        data.sort(key=lambda x: x["position"])
+
+        # Write updated data back to file
+        with open(json_file, "w") as file:
+            json.dump(data, file, indent=2)
 
     @abc.abstractmethod
     def setup(self):
@@ -100,8 +177,41 @@ class PersonalAssistantFramework(abc.ABC):
     def think(self, prompt: str) -> str:
         pass
 
+    @abc.abstractmethod
+    def stream_voice_audio(self, text: str):
+        """
+        Yield raw int16 PCM at pcm_sample_rate as the provider streams it.
+        """
+        pass
+
+    def generate_voice_audio_with_format(self, text: str) -> Tuple[bytes, str]:
+        """
+        generate_voice_audio() and the file extension of the bytes it returned.
+        """
+        return self.generate_voice_audio(text), self.voice_audio_format
+
+    def stream_voice_audio_with_rate(self, text: str) -> Tuple[Iterator[bytes], int]:
+        """
+        stream_voice_audio() and the sample rate of the PCM it yields.
+        """
+        return self.stream_voice_audio(text), self.pcm_sample_rate
+
+    @staticmethod
+    def _elevenlabs_pcm_stream(client, text: str, model: str):
+        rate_limit("elevenlabs", model)
+        return client.generate(
+            text=text,
+            voice=ELEVEN_LABS_PRIMARY_SOLID_VOICE,
+            model=model,
+            stream=True,
+            output_format=f"pcm_{TTS_PCM_SAMPLE_RATE}",
+        )
+
 
 class AssElevenPAF(PersonalAssistantFramework):
+    stt_provider = "assemblyai"
+    tts_provider = "elevenlabs"
+
     def setup(self):
         aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
         self.elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVEN_API_KEY"))
@@ -109,24 +219,37 @@ class AssElevenPAF(PersonalAssistantFramework):
 
     @PersonalAssistantFramework.timeit_decorator
     def generate_voice_audio(self, text: str):
-        audio_generator = self.elevenlabs_client.generate(
-            text=text,
-            voice=ELEVEN_LABS_PRIMARY_SOLID_VOICE,
-            model="eleven_turbo_v2",
-            stream=False,
-        )
-        audio_bytes = b"".join(list(audio_generator))
-        return audio_bytes
+        def generate():
+            audio_generator = self.elevenlabs_client.generate(
+                text=text,
+                voice=ELEVEN_LABS_PRIMARY_SOLID_VOICE,
+                model="eleven_turbo_v2",
+                stream=False,
+            )
+            return b"".join(list(audio_generator))
+
+        return provider_call("elevenlabs", "eleven_turbo_v2", generate, key=text)
 
     @PersonalAssistantFramework.timeit_decorator
     def transcribe(self, file_path):
+        set_attribute("bytes_uploaded", os.path.getsize(file_path))
         transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(file_path)
+        transcript = provider_call(
+            "assemblyai",
+            "best",
+            functools.partial(transcriber.transcribe, file_path),
+            key=file_path,
+        )
         return transcript.text
 
+    def stream_voice_audio(self, text: str):
+        return self._elevenlabs_pcm_stream(
+            self.elevenlabs_client, text, "eleven_turbo_v2"
+        )
+
+    @PersonalAssistantFramework.timeit_decorator
     def speak(self, text: str):
-        audio = self.generate_voice_audio(text)
-        play(audio)
+        play_pcm_stream(*self.stream_voice_audio_with_rate(text))
 
     @PersonalAssistantFramework.timeit_decorator
     def think(self, thought: str) -> str:
@@ -134,30 +257,49 @@ class AssElevenPAF(PersonalAssistantFramework):
 
 
 class OpenAIPAF(PersonalAssistantFramework):
+    voice_audio_format = "aac"
+    pcm_sample_rate = OPENAI_PCM_SAMPLE_RATE
+
     def setup(self):
         openai.api_key = os.getenv("OPENAI_API_KEY")
         self.llm_model = build_mini_model()
 
     @PersonalAssistantFramework.timeit_decorator
     def transcribe(self, file_path):
-        with open(file_path, "rb") as audio_file:
-            transcript = openai.audio.transcriptions.create(
-                model="whisper-1",  # this points to whisper v2. See Docs (https://platform.openai.com/docs/api-reference/audio/createTranscription)
-                file=audio_file,
-            )
+        set_attribute("bytes_uploaded", os.path.getsize(file_path))
+        def create_transcription():
+            with open(file_path, "rb") as audio_file:
+                return openai.audio.transcriptions.create(
+                    model="whisper-1",  # this points to whisper v2. See Docs (https://platform.openai.com/docs/api-reference/audio/createTranscription)
+                    file=audio_file,
+                )
+
+        transcript = provider_call(
+            "openai", "whisper-1", create_transcription, key=file_path
+        )
         return transcript.text
 
     @PersonalAssistantFramework.timeit_decorator
     def generate_voice_audio(self, text: str):
-        response = openai.audio.speech.create(
-            model="tts-1-hd", voice="shimmer", input=text, response_format="aac"
-        )
-        audio_bytes = b"".join(list(response.iter_bytes()))
-        return audio_bytes
+        def generate():
+            response = openai.audio.speech.create(
+                model="tts-1-hd", voice="shimmer", input=text, response_format="aac"
+            )
+            return b"".join(list(response.iter_bytes()))
+
+        return provider_call("openai", "tts-1-hd", generate, key=text)
+
+    def stream_voice_audio(self, text: str):
+        rate_limit("openai", "tts-1-hd")
+        # OpenAI's pcm format is 24kHz int16 mono, no container to decode
+        with openai.audio.speech.with_streaming_response.create(
+            model="tts-1-hd", voice="shimmer", input=text, response_format="pcm"
+        ) as response:
+            yield from response.iter_bytes(chunk_size=4096)
 
+    @PersonalAssistantFramework.timeit_decorator
     def speak(self, text: str):
-        audio = self.generate_voice_audio(text)
-        play(audio)
+        play_pcm_stream(*self.stream_voice_audio_with_rate(text))
 
     @PersonalAssistantFramework.timeit_decorator
     def think(self, thought: str) -> str:
@@ -165,6 +307,9 @@ class OpenAIPAF(PersonalAssistantFramework):
 
 
 class GroqElevenPAF(PersonalAssistantFramework):
+    stt_provider = "groq"
+    tts_provider = "elevenlabs"
+
     def setup(self):
         self.groq_client = Groq()
         self.elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVEN_API_KEY"))
@@ -172,46 +317,347 @@ class GroqElevenPAF(PersonalAssistantFramework):
 
     @PersonalAssistantFramework.timeit_decorator
     def transcribe(self, file_path):
-        with open(file_path, "rb") as file:
-            transcription = self.groq_client.audio.transcriptions.create(
-                file=(file_path, file.read()),
-                model="distil-whisper-large-v3-en",
-                response_format="text",
-            )
+        set_attribute("bytes_uploaded", os.path.getsize(file_path))
+        def create_transcription():
+            with open(file_path, "rb") as file:
+                return self.groq_client.audio.transcriptions.create(
+                    file=(file_path, file.read()),
+                    model="distil-whisper-large-v3-en",
+                    response_format="text",
+                )
+
+        transcription = provider_call(
+            "groq", "distil-whisper-large-v3-en", create_transcription, key=file_path
+        )
         return str(transcription)
 
     @PersonalAssistantFramework.timeit_decorator
     def generate_voice_audio(self, text: str):
-        audio_generator = self.elevenlabs_client.generate(
-            text=text,
-            voice=ELEVEN_LABS_PRIMARY_SOLID_VOICE,
-            model="eleven_turbo_v2_5",
-            stream=False,
+        def generate():
+            audio_generator = self.elevenlabs_client.generate(
+                text=text,
+                voice=ELEVEN_LABS_PRIMARY_SOLID_VOICE,
+                model="eleven_turbo_v2_5",
+                stream=False,
+            )
+            return b"".join(list(audio_generator))
+
+        return provider_call("elevenlabs", "eleven_turbo_v2_5", generate, key=text)
+
+    def stream_voice_audio(self, text: str):
+        return self._elevenlabs_pcm_stream(
+            self.elevenlabs_client, text, "eleven_turbo_v2_5"
         )
-        audio_bytes = b"".join(list(audio_generator))
-        return audio_bytes
 
+    @PersonalAssistantFramework.timeit_decorator
     def speak(self, text: str):
-        audio = self.generate_voice_audio(text)
-        play(audio)
+        play_pcm_stream(*self.stream_voice_audio_with_rate(text))
 
     @PersonalAssistantFramework.timeit_decorator
     def think(self, thought: str) -> str:
         return prompt(self.llm_model, thought)
 
 
+class HedgedPAF(PersonalAssistantFramework):
+    """
+    Sends transcribe() and think() to several backends so one slow provider
+    doesn't stall the turn. In 'hedge' mode a duplicate goes out once the
+    primary passes its p90 latency, in 'race' mode N backends go at once.
+    """
+
+    def __init__(self, backends: list):
+        self.backends = backends
+        primary = backends[0]
+        self.stt_provider = primary.stt_provider
+        self.llm_provider = primary.llm_provider
+        self.tts_provider = primary.tts_provider
+        self.voice_audio_format = primary.voice_audio_format
+        self.pcm_sample_rate = primary.pcm_sample_rate
+
+    def setup(self):
+        for backend in self.backends:
+            backend.setup()
+        self.think_models = build_models_by_alias(HEDGED_THINK_MODEL_IDS)
+        latency_tracker.seed_from_time_tables()
+
+    def _call(self, candidates):
+        if HEDGE_MODE == "race":
+            name, result = race(candidates, n=HEDGE_RACE_N)
+        else:
+            name, result = hedged_call(
+                candidates,
+                default_delay=HEDGE_DEFAULT_DELAY,
+                percentile=HEDGE_PERCENTILE,
+            )
+        print(f"🏁 {name} won")
+        return result
+
+    @PersonalAssistantFramework.timeit_decorator
+    def transcribe(self, file_path):
+        return self._call(
+            [
+                (
+                    f"{backend.__class__.__name__}.transcribe",
+                    functools.partial(backend.transcribe, file_path),
+                )
+                for backend in self.backends
+            ]
+        )
+
+    @PersonalAssistantFramework.timeit_decorator
+    def think(self, thought: str) -> str:
+        return self._call(
+            [
+                (
+                    f"{get_model_name(model)}.think",
+                    functools.partial(prompt, model, thought),
+                )
+                for model in self.think_models
+            ]
+        )
+
+    def generate_voice_audio(self, text: str):
+        return self.backends[0].generate_voice_audio(text)
+
+    def generate_voice_audio_with_format(self, text: str) -> Tuple[bytes, str]:
+        return self.backends[0].generate_voice_audio_with_format(text)
+
+    def stream_voice_audio(self, text: str):
+        return self.backends[0].stream_voice_audio(text)
+
+    def stream_voice_audio_with_rate(self, text: str) -> Tuple[Iterator[bytes], int]:
+        return self.backends[0].stream_voice_audio_with_rate(text)
+
+    def speak(self, text: str):
+        self.backends[0].speak(text)
+
+
+class RouterPAF(PersonalAssistantFramework):
+    """
+    Picks the STT, LLM and TTS provider per call from rolling latency and error
+    stats, so e.g. Groq STT + mini LLM + ElevenLabs TTS can mix freely and a
+    failing provider is skipped until its circuit breaker closes again.
+    """
+
+    # Providers are picked per call, batch mode throttles the router as a whole
+    stt_provider = "router"
+    llm_provider = "router"
+    tts_provider = "router"
+    # Depends on which backend speaks, use generate_voice_audio_with_format()
+    # and stream_voice_audio_with_rate()
+    voice_audio_format = None
+    pcm_sample_rate = None
+
+    def __init__(self, stt_backends: list, tts_backends: list):
+        self.stt_backends = stt_backends
+        self.tts_backends = tts_backends
+        self.router = Router(
+            timeouts=ROUTER_TIMEOUTS,
+            max_retries=ROUTER_MAX_RETRIES,
+            backoff=ROUTER_RETRY_BACKOFF,
+            breaker_failures=ROUTER_BREAKER_FAILURES,
+            breaker_cooldown=ROUTER_BREAKER_COOLDOWN,
+            explore_rate=ROUTER_EXPLORE_RATE,
+        )
+
+    def setup(self):
+        # A backend may serve both STT and TTS, only set it up once
+        backends = {id(b): b for b in self.stt_backends + self.tts_backends}
+        for backend in backends.values():
+            backend.setup()
+        self.think_models = build_models_by_alias(ROUTER_LLM_MODEL_IDS)
+        latency_tracker.seed_from_time_tables()
+
+    @PersonalAssistantFramework.timeit_decorator
+    def transcribe(self, file_path):
+        return self.router.call(
+            "stt",
+            [
+                (
+                    f"{backend.__class__.__name__}.transcribe",
+                    functools.partial(backend.transcribe, file_path),
+                )
+                for backend in self.stt_backends
+            ],
+        )
+
+    @PersonalAssistantFramework.timeit_decorator
+    def think(self, thought: str) -> str:
+        return self.router.call(
+            "llm",
+            [
+                (
+                    f"{get_model_name(model)}.think",
+                    functools.partial(prompt, model, thought),
+                )
+                for model in self.think_models
+            ],
+        )
+
+    def generate_voice_audio(self, text: str):
+        return self.generate_voice_audio_with_format(text)[0]
+
+    def generate_voice_audio_with_format(self, text: str) -> Tuple[bytes, str]:
+        return self.router.call(
+            "tts",
+            [
+                (
+                    f"{backend.__class__.__name__}.generate_voice_audio",
+                    functools.partial(backend.generate_voice_audio_with_format, text),
+                )
+                for backend in self.tts_backends
+            ],
+        )
+
+    def stream_voice_audio(self, text: str):
+        return self.stream_voice_audio_with_rate(text)[0]
+
+    def stream_voice_audio_with_rate(self, text: str) -> Tuple[Iterator[bytes], int]:
+        def open_stream(backend):
+            # Pull the first chunk inside the routed call so a provider that
+            # can't start streaming in time fails over like any other error
+            chunks, sample_rate = backend.stream_voice_audio_with_rate(text)
+            chunks = iter(chunks)
+            return next(chunks, b""), chunks, sample_rate
+
+        def close_stream(opened):
+            # Closing the generator closes the provider's HTTP response
+            close = getattr(opened[1], "close", None)
+            if close is not None:
+                close()
+
+        opened = self.router.call(
+            "tts",
+            [
+                (
+                    f"{backend.__class__.__name__}.stream_voice_audio",
+                    functools.partial(open_stream, backend),
+                )
+                for backend in self.tts_backends
+            ],
+            discard=close_stream,
+        )
+
+        def stream():
+            try:
+                yield opened[0]
+                yield from opened[1]
+            finally:
+                close_stream(opened)
+
+        return stream(), opened[2]
+
+    @PersonalAssistantFramework.timeit_decorator
+    def speak(self, text: str):
+        play_pcm_stream(*self.stream_voice_audio_with_rate(text))
+
+
+class OllamaPAF(PersonalAssistantFramework):
+    """
+    Thinks with a local Ollama model. Transcription and speech go through the
+    speech backend (OLLAMA_SPEECH_BACKEND).
+
+    The model is preloaded and warmed up in setup() and kept resident with
+    keep_alive. With OLLAMA_REUSE_CONTEXT a conversation continues from the
+    previous turn's context and only sends the latest input, so the server's
+    KV cache isn't rebuilt from the full history every time.
+    """
+
+    llm_provider = "ollama"
+    manages_history = OLLAMA_REUSE_CONTEXT
+
+    def __init__(self, speech_backend: PersonalAssistantFramework):
+        self.speech_backend = speech_backend
+        self.stt_provider = speech_backend.stt_provider
+        self.tts_provider = speech_backend.tts_provider
+        self.voice_audio_format = speech_backend.voice_audio_format
+        self.pcm_sample_rate = speech_backend.pcm_sample_rate
+
+    def setup(self):
+        self.speech_backend.setup()
+        print(f"🦙 Loading {OLLAMA_MODEL}...")
+        local_llm.preload(OLLAMA_MODEL, OLLAMA_KEEP_ALIVE)
+        # Warm-up only, don't keep its context
+        local_llm.generate(
+            OLLAMA_MODEL,
+            OLLAMA_WARMUP_PROMPT,
+            OLLAMA_KEEP_ALIVE,
+            options={"num_predict": 1},
+        )
+
+    def new_conversation(self) -> local_llm.Conversation:
+        return local_llm.Conversation()
+
+    def transcribe(self, file_path):
+        return self.speech_backend.transcribe(file_path)
+
+    @PersonalAssistantFramework.timeit_decorator
+    def think(
+        self,
+        thought: str,
+        conversation: Optional[local_llm.Conversation] = None,
+        latest_input: Optional[str] = None,
+    ) -> str:
+        """
+        Without a conversation every call stands alone (e.g. batch jobs). With
+        one, `thought` (the full prompt, history included) is only sent when its
+        context is empty or full, otherwise just `latest_input` continues it.
+        """
+
+        if conversation is None or latest_input is None:
+            response, _ = local_llm.generate(OLLAMA_MODEL, thought, OLLAMA_KEEP_ALIVE)
+            return response
+
+        with conversation.lock:
+            if len(conversation.context) > OLLAMA_MAX_CONTEXT_TOKENS:
+                print("🦙 Context full, starting a fresh one from the history.")
+                conversation.context = []
+            if conversation.context:
+                thought = OLLAMA_FOLLOW_UP_PROMPT.replace(
+                    "[[latest_input]]", latest_input
+                )
+
+            response, conversation.context = local_llm.generate(
+                OLLAMA_MODEL,
+                thought,
+                OLLAMA_KEEP_ALIVE,
+                context=conversation.context,
+            )
+        return response
+
+    def generate_voice_audio(self, text: str):
+        return self.speech_backend.generate_voice_audio(text)
+
+    def generate_voice_audio_with_format(self, text: str) -> Tuple[bytes, str]:
+        return self.speech_backend.generate_voice_audio_with_format(text)
+
+    def stream_voice_audio(self, text: str):
+        return self.speech_backend.stream_voice_audio(text)
+
+    def stream_voice_audio_with_rate(self, text: str) -> Tuple[Iterator[bytes], int]:
+        return self.speech_backend.stream_voice_audio_with_rate(text)
+
+    def speak(self, text: str):
+        self.speech_backend.speak(text)
+
+
 class OpenAISuperPAF(OpenAIPAF):
     def setup(self):
         super().setup()
         openai.api_key = os.getenv("OPENAI_API_KEY")
         self.weak_model = build_mini_model()
         self.download_directory = os.path.join(os.getcwd(), OPENAI_IMG_AGENT_DIR)
-        if not os.path.exists(self.download_directory):
-            os.makedirs(self.download_directory)
-
-    def generate_image(self, generate_image_params: GenerateImageParams) -> bool:
+        self.image_store = ImageStore(
+            self.download_directory, IMAGE_STORE_MAX_VERSIONS
+        )
+        self.image_store.collect_garbage()
+        load_tool_plugins(TOOL_PLUGIN_MODULES)
+        # Build the schemas and prompt section once, up front
+        tool_schemas()
+        tools_prompt()
 
-        # handle defaults
+    @staticmethod
+    def _apply_image_defaults(generate_image_params: GenerateImageParams):
         if generate_image_params.image_ratio is None:
             generate_image_params.image_ratio = ImageRatio.SQUARE
         if generate_image_params.quality is None:
@@ -219,42 +665,103 @@ class OpenAISuperPAF(OpenAIPAF):
         if generate_image_params.style is None:
             generate_image_params.style = Style.NATURAL
 
+    @register_tool(
+        GenerateImageParams,
+        trigger="If the human companion requests an image, use this tool.",
+        details=[
+            "Unless otherwise specified, default quality to 'hd'.",
+            "Create as many images as the user requested by adding that many prompts to the prompts parameter.",
+        ],
+        concurrency="network",
+        cost_hint="$0.08-0.12 per hd image",
+    )
+    @traced("tool.generate_image")
+    def generate_image(self, generate_image_params: GenerateImageParams) -> ToolResult:
+
+        # handle defaults
+        self._apply_image_defaults(generate_image_params)
+
+        versions = [
+            self._generate_one_image(prompt, generate_image_params)
+            for prompt in generate_image_params.prompts
+        ]
+        self.image_store.collect_garbage()
+
+        note = self._versions_note(versions)
+        print(f"🖼️ {note}")
+        return ToolResult(True, note=note, data=versions)
+
+    @staticmethod
+    def _versions_note(versions: list) -> str:
+        # Version ids keep growing across requests, so tell the model which
+        # ones are new or it can't refer to them in later conversions/resizes
+        return f"Created image versions {', '.join(map(str, versions))}."
+
+    def _generate_one_image(
+        self, prompt: str, generate_image_params: GenerateImageParams
+    ) -> int:
         client = openai.OpenAI()
-        subdirectory = os.path.join(self.download_directory)
-        if not os.path.exists(subdirectory):
-            os.makedirs(subdirectory)
-
-        for index, prompt in enumerate(generate_image_params.prompts):
-            print(f"🖼️ Generating image {index + 1} with prompt: {prompt}")
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=generate_image_params.image_ratio.value,
-                quality=generate_image_params.quality,
-                n=1,
-                style=generate_image_params.style.value,
+
+        print(f"🖼️ Generating image with prompt: {prompt}")
+        with span(
+            "image.generate",
+            model="dall-e-3",
+            size=generate_image_params.image_ratio.value,
+        ):
+            response = provider_call(
+                "openai",
+                "dall-e-3",
+                functools.partial(
+                    client.images.generate,
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size=generate_image_params.image_ratio.value,
+                    quality=generate_image_params.quality,
+                    n=1,
+                    style=generate_image_params.style.value,
+                ),
+                # No single-flight key: the same prompt twice means two images
             )
-            image_url = response.data[0].url
+        image_url = response.data[0].url
+        with span("image.download") as download_span:
             image_response = requests.get(image_url)
-            image_path = os.path.join(subdirectory, f"version_{index}.png")
-            with open(image_path, "wb") as file:
-                file.write(image_response.content)
-
-        return True
+            download_span.set_attribute(
+                "bytes_downloaded", len(image_response.content)
+            )
+        version = self.image_store.reserve_version()
+        image_path = self.image_store.path_for(version)
+        with open(image_path, "wb") as file:
+            file.write(image_response.content)
+        self.image_store.add_version(
+            version,
+            image_path,
+            prompt=prompt,
+            size=generate_image_params.image_ratio.value,
+            style=generate_image_params.style.value,
+            quality=generate_image_params.quality.value,
+        )
 
+        return version
+
+    @register_tool(
+        ConvertImageParams,
+        trigger="If the human companion requests an image format conversion, use this tool.",
+        details=[
+            "Set image_format to the desired format (e.g., 'jpg', 'png').",
+            "Use version_numbers to specify which image versions to convert.",
+        ],
+        concurrency="cpu",
+    )
+    @traced("tool.convert_image")
     def convert_image(self, convert_image_params: ConvertImageParams) -> bool:
-        subdirectory = os.path.join(self.download_directory)
-        if not os.path.exists(subdirectory):
-            os.makedirs(subdirectory)
-
         for index in convert_image_params.version_numbers:
-            input_path = os.path.join(subdirectory, f"version_{index}.png")
-            if not os.path.exists(input_path):
-                print(f"🟡 Warning: File {input_path} does not exist. Skipping.")
+            input_path = self.image_store.image_path(index)
+            if input_path is None:
+                print(f"🟡 Warning: Image version {index} does not exist. Skipping.")
                 continue
 
-            output_path = os.path.join(
-                subdirectory, f"version_{index}.{convert_image_params.image_format}"
+            output_path = self.image_store.path_for(
+                index, f".{convert_image_params.image_format.value}"
             )
 
             try:
@@ -263,6 +770,12 @@ class OpenAISuperPAF(OpenAIPAF):
                         output_path,
                         format=convert_image_params.image_format.value.upper(),
                     )
+                self.image_store.add_derivative(
+                    index,
+                    output_path,
+                    kind="convert",
+                    image_format=convert_image_params.image_format.value,
+                )
                 print(f"🖼️ Converted {input_path} to {output_path}")
             except Exception as e:
                 print(f"Error converting {input_path}: {str(e)}")
@@ -270,20 +783,26 @@ class OpenAISuperPAF(OpenAIPAF):
 
         return True
 
+    @register_tool(
+        ResizeImageParams,
+        trigger="If the human companion requests an image resize, use this tool.",
+        details=[
+            "Specify the desired width and height in pixels.",
+            "Use version_numbers to specify which image versions to resize.",
+        ],
+        concurrency="cpu",
+    )
+    @traced("tool.resize_image")
     def resize_image(self, resize_image_params: ResizeImageParams) -> bool:
-        subdirectory = os.path.join(self.download_directory)
-        if not os.path.exists(subdirectory):
-            os.makedirs(subdirectory)
-
         for index in resize_image_params.version_numbers:
-            input_path = os.path.join(subdirectory, f"version_{index}.png")
-            if not os.path.exists(input_path):
-                print(f"🟡 Warning: File {input_path} does not exist. Skipping.")
+            input_path = self.image_store.image_path(index)
+            if input_path is None:
+                print(f"🟡 Warning: Image version {index} does not exist. Skipping.")
                 continue
 
-            output_path = os.path.join(
-                subdirectory,
-                f"version_{index}_resized_w{resize_image_params.width}_h{resize_image_params.height}.png",
+            output_path = self.image_store.path_for(
+                index,
+                f"_resized_w{resize_image_params.width}_h{resize_image_params.height}.png",
             )
 
             try:
@@ -292,6 +811,13 @@ class OpenAISuperPAF(OpenAIPAF):
                         (resize_image_params.width, resize_image_params.height)
                     )
                     resized_img.save(output_path)
+                self.image_store.add_derivative(
+                    index,
+                    output_path,
+                    kind="resize",
+                    width=resize_image_params.width,
+                    height=resize_image_params.height,
+                )
                 print(f"🖼️ Resized {input_path} to {output_path}")
             except Exception as e:
                 print(f"Error resizing {input_path}: {str(e)}")
@@ -299,6 +825,13 @@ class OpenAISuperPAF(OpenAIPAF):
 
         return True
 
+    @register_tool(
+        OpenImageDirParams,
+        trigger="If the human companion requests to open the image directory, use this tool.",
+        details=["This tool doesn't require any parameters."],
+        concurrency="ui",
+    )
+    @traced("tool.open_image_directory")
     def open_image_directory(self, open_image_dir_params: OpenImageDirParams) -> bool:
         try:
             if os.name == "nt":  # For Windows
@@ -311,24 +844,121 @@ class OpenAISuperPAF(OpenAIPAF):
             print(f"Error opening image directory: {str(e)}")
             return False
 
-    @PersonalAssistantFramework.timeit_decorator
-    def think(self, thought: str) -> str:
+    def _messages(self, thought: str):
+        return [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": thought},
+        ]
+
+    def _record_completion(self, completion):
+        set_attribute("model", completion.model)
+        if completion.usage:
+            set_attribute("input_tokens", completion.usage.prompt_tokens)
+            set_attribute("output_tokens", completion.usage.completion_tokens)
+
+    def _parse_completion(self, thought: str):
         client = openai.OpenAI()
-        completion = client.beta.chat.completions.parse(
-            model="gpt-4o-2024-08-06",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": thought},
-            ],
-            tools=[
-                openai.pydantic_function_tool(GenerateImageParams),
-                openai.pydantic_function_tool(ConvertImageParams),
-                openai.pydantic_function_tool(ResizeImageParams),
-                openai.pydantic_function_tool(OpenImageDirParams),
-            ],
+        completion = provider_call(
+            "openai",
+            "gpt-4o-2024-08-06",
+            functools.partial(
+                client.beta.chat.completions.parse,
+                model="gpt-4o-2024-08-06",
+                messages=self._messages(thought),
+                tools=list(tool_schemas()),
+            ),
         )
+        self._record_completion(completion)
+        return completion.choices[0].message
+
+    def _dispatch_ready_images(self, arguments: dict, executor, futures: list):
+        """
+        Start the image tool for every prompt that's complete in the (partial)
+        tool call arguments and hasn't been started yet. The image settings come
+        before prompts in GenerateImageParams, so once a prompt is complete they
+        are too. Each prompt runs through the registry like a regular tool call,
+        one prompt per call.
+        """
+
+        settings = [f for f in GenerateImageParams.model_fields if f != "prompts"]
+        if not all(field in arguments for field in settings):
+            return
+
+        image_tool = get_tool("GenerateImageParams")
+        prompts = arguments.get("prompts") or []
+        for index in range(len(futures), len(prompts)):
+            params = GenerateImageParams.model_validate(
+                {**arguments, "prompts": [prompts[index]]}
+            )
+            futures.append(submit_in_context(executor, image_tool.run, self, params))
+
+    def _stream_completion(self, thought: str):
+        """
+        Stream the completion and start image generation while the model is
+        still writing the rest of the GenerateImageParams arguments.
+
+        Returns the final message and, if images were generated early, their
+        ToolResult (None if no tool ran early).
+        """
+
+        client = openai.OpenAI()
+        futures = []
+        image_tool = get_tool("GenerateImageParams")
+        max_workers = TOOL_CONCURRENCY_LIMITS.get(image_tool.concurrency, 1)
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="image") as executor:
+            rate_limit("openai", "gpt-4o-2024-08-06")
+            with client.beta.chat.completions.stream(
+                model="gpt-4o-2024-08-06",
+                messages=self._messages(thought),
+                tools=list(tool_schemas()),
+            ) as stream:
+                for event in stream:
+                    if (
+                        event.type == "tool_calls.function.arguments.delta"
+                        and event.name == "GenerateImageParams"
+                        and event.index == 0
+                    ):
+                        arguments = parse_partial_json(event.arguments)
+                        if isinstance(arguments, dict):
+                            self._dispatch_ready_images(arguments, executor, futures)
+                completion = stream.get_final_completion()
+
+            self._record_completion(completion)
+            message = completion.choices[0].message
+
+            tool_calls = message.tool_calls or []
+            if not tool_calls or tool_calls[0].function.name != "GenerateImageParams":
+                return message, None
+
+            # Anything the partial parse couldn't see yet, e.g. the last prompt
+            parsed_arguments = tool_calls[0].function.parsed_arguments
+            self._dispatch_ready_images(
+                parsed_arguments.model_dump(mode="json"), executor, futures
+            )
+            set_attribute("images", len(futures))
+
+            early_success = True
+            versions = []
+            for future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error generating image: {str(e)}")
+                    early_success = False
+                    continue
+                early_success = early_success and result.success
+                versions.extend(result.data or [])
+            note = self._versions_note(versions) if versions else None
+
+        return message, ToolResult(early_success, note=note, data=versions)
 
-        message = completion.choices[0].message
+    @PersonalAssistantFramework.timeit_decorator
+    def think(self, thought: str) -> str:
+        early_result = None
+        if OPENAI_SUPER_STREAM_TOOL_CALLS:
+            message, early_result = self._stream_completion(thought)
+        else:
+            message = self._parse_completion(thought)
 
         if message.tool_calls:
 
@@ -345,29 +975,29 @@ class OpenAISuperPAF(OpenAIPAF):
 Calling..."""
             )
 
-            success = False
+            result = ToolResult(False)
 
             tool_call_success_prompt = f"Quickly let your human companion know that you've run the '{tool_call.function.name}' tool. Respond in a short, conversational manner, no fluff."
 
-            tool_function_map = {
-                "GenerateImageParams": self.generate_image,
-                "ConvertImageParams": self.convert_image,
-                "ResizeImageParams": self.resize_image,
-                "OpenImageDirParams": self.open_image_directory,
-            }
+            tool = get_tool(tool_call.function.name)
 
-            if tool_call.function.name in tool_function_map:
+            if early_result is not None:
+                # The tool already ran while the arguments were streaming in
+                result = early_result
+            elif tool is not None:
                 # 🚀 GUARANTEED OUTPUT STRUCTURE 🚀
                 params = tool_call.function.parsed_arguments
-                success = tool_function_map[tool_call.function.name](params)
+                result = tool.run(self, params)
                 tool_call_success_prompt = f"Quickly let your human companion know that you've run the '{tool_call.function.name}' tool. Respond in a short, conversational manner, no fluff."
             else:
-                success = False
+                result = ToolResult(False)
                 tool_call_success_prompt = (
                     "An unknown tool was called. Please try again."
                 )
 
-            if success:
+            if result.success:
+                if result.note:
+                    tool_call_success_prompt += f" Mention this: {result.note}"
                 return prompt(self.weak_model, tool_call_success_prompt)
 
         else:
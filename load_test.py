@@ -0,0 +1,371 @@
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import threading
+import time
+import wave
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from assistants.assistants import OpenAIPAF
+from main import build_prompt
+from modules.constants import (
+    FS,
+    CHANNELS,
+    CONVO_TRAIL_CUTOFF,
+    PROVIDER_RATE_LIMITS,
+    TRACE_FILE,
+)
+from modules.stand_in_backends import StandInConfig, start_stand_in_server
+from modules.typings import Interaction
+
+load_dotenv()
+
+
+class LoadStats:
+    """
+    Per report interval: stage latencies, completed turns and errors.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total_turns = 0
+        self.reset()
+
+    def reset(self):
+        self.durations: Dict[str, List[float]] = {}
+        self.turns = 0
+        self.errors = 0
+
+    def record(self, stage: str, duration: float):
+        with self._lock:
+            self.durations.setdefault(stage, []).append(duration)
+
+    def turn_done(self):
+        with self._lock:
+            self.turns += 1
+            self.total_turns += 1
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot_and_reset(self):
+        with self._lock:
+            snapshot = (self.durations, self.turns, self.errors)
+            self.reset()
+        return snapshot
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 3)
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # Peak rather than current RSS, in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024), 1)
+
+
+def open_fds() -> Optional[int]:
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(fd_dir):
+            return len(os.listdir(fd_dir))
+    return None
+
+
+def file_kb(path: str) -> float:
+    return round(os.path.getsize(path) / 1024, 1) if os.path.exists(path) else 0.0
+
+
+def write_sample_audio(path: str, seconds: float = 3.0):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(2)
+        wf.setframerate(FS)
+        wf.writeframes(b"\x00\x00" * CHANNELS * int(FS * seconds))
+
+
+def run_session(
+    session_id: int,
+    audio_files: List[str],
+    deadline: float,
+    max_turns: Optional[int],
+    stats: LoadStats,
+    histories: Dict[int, List[Interaction]],
+    stop: threading.Event,
+):
+    """
+    One synthetic user running main()'s loop minus the microphone and speakers.
+
+    Turn errors are counted and the session carries on, but a setup failure
+    raises so the whole run stops instead of reporting an empty run.
+    """
+
+    # Models are already built by main(), this only picks them up
+    assistant = OpenAIPAF()
+    assistant.setup()
+    previous_interactions: List[Interaction] = []
+    histories[session_id] = previous_interactions
+
+    turn = 0
+    while (
+        not stop.is_set()
+        and time.time() < deadline
+        and (max_turns is None or turn < max_turns)
+    ):
+        turn += 1
+        filename = os.path.join("data", f"audio_load_{session_id}_{turn}.wav")
+        try:
+            # Same file lifecycle as create_audio_file() + os.remove() in main
+            shutil.copyfile(random.choice(audio_files), filename)
+
+            start_time = time.time()
+            transcription = assistant.transcribe(filename)
+            stats.record("transcribe", time.time() - start_time)
+
+            start_time = time.time()
+            prompt = build_prompt(
+                transcription, previous_interactions, assistant_type="OpenAIPAF"
+            )
+            response = assistant.think(prompt)
+            stats.record("think", time.time() - start_time)
+
+            start_time = time.time()
+            for _ in assistant.stream_voice_audio(response):
+                pass
+            stats.record("speak", time.time() - start_time)
+
+            previous_interactions.append(
+                Interaction(role="human", content=transcription)
+            )
+            previous_interactions.append(
+                Interaction(role="assistant", content=response)
+            )
+            if len(previous_interactions) > CONVO_TRAIL_CUTOFF:
+                del previous_interactions[:-CONVO_TRAIL_CUTOFF]
+
+            stats.turn_done()
+        except Exception as e:
+            stats.error()
+            print(f"❌ Session {session_id} turn {turn}: {e.__class__.__name__}: {e}")
+        finally:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+def report(
+    stats: LoadStats,
+    histories: Dict[int, List[Interaction]],
+    interval: float,
+    started_at: float,
+) -> dict:
+    durations, turns, errors = stats.snapshot_and_reset()
+    sample = {
+        "elapsed_minutes": round((time.time() - started_at) / 60, 2),
+        "turns_per_second": round(turns / interval, 2),
+        "errors": errors,
+        "rss_mb": rss_mb(),
+        "open_fds": open_fds(),
+        "threads": threading.active_count(),
+        "history_items": sum(len(history) for history in histories.values()),
+        "time_table_kb": file_kb("OpenAIPAF_time_table.json"),
+        "trace_kb": file_kb(TRACE_FILE),
+    }
+    for stage, values in durations.items():
+        for p in (50, 90, 99):
+            sample[f"{stage}_p{p}"] = percentile(values, p)
+
+    print(
+        f"📊 {sample['elapsed_minutes']}m | {sample['turns_per_second']} turns/s | "
+        f"think p50/p99 {sample.get('think_p50')}/{sample.get('think_p99')}s | "
+        f"rss {sample['rss_mb']}MB | fds {sample['open_fds']} | "
+        f"threads {sample['threads']} | errors {errors}"
+    )
+    return sample
+
+
+def slope_per_hour(samples: List[dict], key: str) -> Optional[float]:
+    """
+    Least squares growth rate of `key` - a steady positive slope is a leak.
+    """
+
+    points = [
+        (s["elapsed_minutes"] / 60, s[key]) for s in samples if s.get(key) is not None
+    ]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return round(covariance / variance, 2)
+
+
+def main():
+    """
+    Load and soak test: hundreds of concurrent synthetic sessions of
+    pre-recorded audio run through OpenAIPAF against local stand-in backends.
+
+    Every interval it reports throughput, latency percentiles, RSS, open file
+    descriptors, threads and the size of the files the framework grows, and
+    appends the sample to report.jsonl. At the end it prints the growth rate
+    per hour of each resource, so leaks show up as steady positive slopes.
+    """
+
+    parser = argparse.ArgumentParser(description="Load / soak test the assistant")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--turns", type=int, help="Max turns per session")
+    parser.add_argument("--ramp-seconds", type=float, default=30)
+    parser.add_argument("--report-seconds", type=float, default=30)
+    parser.add_argument(
+        "--audio-dir", help="Pre-recorded .wav files (default: generated silence)"
+    )
+    parser.add_argument("--transcribe-latency", type=float, default=0.4)
+    parser.add_argument("--think-latency", type=float, default=0.6)
+    parser.add_argument("--speak-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--keep-rate-limits",
+        action="store_true",
+        help="Apply PROVIDER_RATE_LIMITS (off by default, the stand-in has no limits)",
+    )
+    parser.add_argument(
+        "--workdir",
+        default=os.path.join("data", "load_test", time.strftime("%Y%m%d_%H%M%S")),
+    )
+    args = parser.parse_args()
+
+    audio_files = []
+    if args.audio_dir:
+        audio_files = [
+            os.path.abspath(os.path.join(args.audio_dir, name))
+            for name in sorted(os.listdir(args.audio_dir))
+            if name.lower().endswith(".wav")
+        ]
+
+    # Run inside a scratch directory so time tables, traces and audio files
+    # from the test don't mix with real ones
+    os.makedirs(os.path.join(args.workdir, "data"), exist_ok=True)
+    os.chdir(args.workdir)
+    if not audio_files:
+        write_sample_audio("sample.wav")
+        audio_files = [os.path.abspath("sample.wav")]
+
+    server = start_stand_in_server(
+        StandInConfig(
+            transcribe_latency=args.transcribe_latency,
+            think_latency=args.think_latency,
+            speak_latency=args.speak_latency,
+            error_rate=args.error_rate,
+        )
+    )
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "stand-in"
+    if not args.keep_rate_limits:
+        PROVIDER_RATE_LIMITS.clear()
+
+    # Load llm's plugins and build the models once, before hundreds of
+    # sessions look them up at the same time
+    OpenAIPAF().setup()
+
+    print(
+        f"🏋️ {args.sessions} sessions for {args.minutes} minutes "
+        f"against {os.environ['OPENAI_BASE_URL']}, writing to {os.getcwd()}"
+    )
+
+    stats = LoadStats()
+    histories: Dict[int, List[Interaction]] = {}
+    samples = []
+    started_at = time.time()
+    deadline = started_at + args.minutes * 60
+    done = threading.Event()
+    stop = threading.Event()
+
+    def write_sample(report_file, interval: float):
+        sample = report(stats, histories, interval, started_at)
+        samples.append(sample)
+        report_file.write(json.dumps(sample) + "\n")
+        report_file.flush()
+
+    def reporter():
+        with open("report.jsonl", "a") as report_file:
+            last_report = time.time()
+            while not done.wait(args.report_seconds):
+                write_sample(report_file, time.time() - last_report)
+                last_report = time.time()
+            # One last sample so runs shorter than an interval still report
+            write_sample(report_file, max(time.time() - last_report, 1e-3))
+
+    reporter_thread = threading.Thread(target=reporter, daemon=True)
+    reporter_thread.start()
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        for session_id in range(args.sessions):
+            futures.append(
+                executor.submit(
+                    run_session,
+                    session_id,
+                    audio_files,
+                    deadline,
+                    args.turns,
+                    stats,
+                    histories,
+                    stop,
+                )
+            )
+            if any(f.done() and f.exception() for f in futures):
+                break
+            time.sleep(args.ramp_seconds / args.sessions)
+
+        # A session that can't start means the harness itself is broken,
+        # stop everything rather than measure whatever is left
+        wait(futures, return_when=FIRST_EXCEPTION)
+        stop.set()
+
+    done.set()
+    reporter_thread.join()
+    server.shutdown()
+
+    session_errors = [f.exception() for f in futures if f.exception()]
+    if session_errors:
+        error = session_errors[0]
+        raise SystemExit(
+            f"❌ {len(session_errors)} sessions failed: "
+            f"{error.__class__.__name__}: {error}"
+        )
+    if stats.total_turns == 0:
+        raise SystemExit("❌ No turns completed, see the errors above.")
+
+    print("\n🏁 Growth per hour (steady positive = leak):")
+    for key in (
+        "rss_mb",
+        "open_fds",
+        "threads",
+        "history_items",
+        "time_table_kb",
+        "trace_kb",
+    ):
+        print(f"   {key}: {slope_per_hour(samples, key)}")
+    print(f"📁 Samples in {os.path.abspath('report.jsonl')}")
+
+
+if __name__ == "__main__":
+    main()
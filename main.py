@@ -1,6 +1,9 @@
 import time
 from typing import List
 from modules.typings import Interaction
+from modules.conversation_summary import ConversationSummarizer, format_interactions
+from modules.tool_registry import tools_prompt
+from modules.tracing import set_attribute, span, start_metrics_server, traced
 import sounddevice as sd
 import wave
 import os
@@ -15,15 +18,29 @@ from modules.constants import (
     CHANNELS,
     DURATION,
     CONVO_TRAIL_CUTOFF,
+    SUMMARIZE_CONVERSATION,
     ASSISTANT_TYPE,
+    HEDGED_ASSISTANT_TYPES,
+    ROUTER_STT_BACKENDS,
+    ROUTER_TTS_BACKENDS,
+    OLLAMA_SPEECH_BACKEND,
 )
 
 from modules.typings import Interaction
-from assistants.assistants import OpenAISuperPAF, OpenAIPAF, AssElevenPAF, GroqElevenPAF
+from assistants.assistants import (
+    OpenAISuperPAF,
+    OpenAIPAF,
+    AssElevenPAF,
+    GroqElevenPAF,
+    HedgedPAF,
+    RouterPAF,
+    OllamaPAF,
+)
 
 load_dotenv()
 
 
+@traced("record_audio")
 def record_audio(duration=DURATION, fs=FS, channels=CHANNELS):
     """
     Simple function to record audio from the microphone.
@@ -64,6 +81,7 @@ def ensure_data_directory_exists():
         os.makedirs("data")
 
 
+@traced("create_audio_file")
 def create_audio_file(recording):
     ensure_data_directory_exists()
     """
@@ -80,38 +98,84 @@ def create_audio_file(recording):
         wf.writeframes(recording)
 
     file_size = os.path.getsize(filename)
+    set_attribute("bytes_written", file_size)
 
     print(f"📁 File {filename} has been saved with a size of {file_size} bytes.")
 
     return filename
 
 
-def build_prompt(latest_input: str, previous_interactions: List[Interaction]) -> str:
+@traced("build_prompt")
+def build_prompt(
+    latest_input: str,
+    previous_interactions: List[Interaction],
+    assistant_type: str = ASSISTANT_TYPE,
+    conversation_summary: str = "",
+) -> str:
 
     base_prompt = PERSONAL_AI_ASSISTANT_PROMPT_HEAD
 
-    if ASSISTANT_TYPE == "OpenAISuperPAF":
+    if assistant_type == "OpenAISuperPAF":
         print(f"🚀 Using OpenAI Super Personal AI Assistant Prompt...")
-        base_prompt = OPENAI_SUPER_ASSISTANT_PROMPT_HEAD
-
-    previous_interactions_str = "\n".join(
-        [
-            f"""<interaction>
-    <role>{interaction.role}</role>
-    <content>{interaction.content}</content>
-</interaction>"""
-            for interaction in previous_interactions
-        ]
-    )
+        base_prompt = OPENAI_SUPER_ASSISTANT_PROMPT_HEAD.replace(
+            "[[tools]]", tools_prompt()
+        )
+
     prepared_prompt = base_prompt.replace(
-        "[[previous_interactions]]", previous_interactions_str
+        "[[conversation_summary]]", conversation_summary
+    )
+    prepared_prompt = prepared_prompt.replace(
+        "[[previous_interactions]]", format_interactions(previous_interactions)
     )
 
     prepared_prompt = prepared_prompt.replace("[[latest_input]]", latest_input)
+    set_attribute("prompt_chars", len(prepared_prompt))
 
     return prepared_prompt
 
 
+def build_assistant(assistant_type: str = ASSISTANT_TYPE):
+    """
+    Build (but don't setup) the assistant for the given ASSISTANT_TYPE.
+    """
+
+    if assistant_type == "OpenAISuperPAF":
+        assistant = OpenAISuperPAF()
+        print("🚀 Initialized OpenAI Super Personal AI Assistant...")
+    elif assistant_type == "OpenAIPAF":
+        assistant = OpenAIPAF()
+        print("🚀 Initialized OpenAI Personal AI Assistant...")
+    elif assistant_type == "AssElevenPAF":
+        assistant = AssElevenPAF()
+        print("🚀 Initialized AssemblyAI-ElevenLabs Personal AI Assistant...")
+    elif assistant_type == "GroqElevenPAF":
+        assistant = GroqElevenPAF()
+        print("🚀 Initialized Groq-ElevenLabs Personal AI Assistant...")
+    elif assistant_type == "HedgedPAF":
+        assistant = HedgedPAF(
+            [build_assistant(backend_type) for backend_type in HEDGED_ASSISTANT_TYPES]
+        )
+        print("🚀 Initialized Hedged Personal AI Assistant...")
+    elif assistant_type == "RouterPAF":
+        # One instance per backend type, shared between the STT and TTS lists
+        backends = {
+            backend_type: build_assistant(backend_type)
+            for backend_type in set(ROUTER_STT_BACKENDS + ROUTER_TTS_BACKENDS)
+        }
+        assistant = RouterPAF(
+            stt_backends=[backends[t] for t in ROUTER_STT_BACKENDS],
+            tts_backends=[backends[t] for t in ROUTER_TTS_BACKENDS],
+        )
+        print("🚀 Initialized Routed Personal AI Assistant...")
+    elif assistant_type == "OllamaPAF":
+        assistant = OllamaPAF(build_assistant(OLLAMA_SPEECH_BACKEND))
+        print("🚀 Initialized Local Ollama Personal AI Assistant...")
+    else:
+        raise ValueError(f"Invalid assistant type: {assistant_type}")
+
+    return assistant
+
+
 def main():
     """
     In a loop, we:
@@ -123,58 +187,71 @@ def main():
     5. Our AI assistant thinks (prompt) of a response to the transcription
     6. Our AI assistant speaks the response
     7. Delete the audio file
-    8. Update previous interactions
+    8. Update previous interactions (older ones get summarized in the background)
     """
 
     previous_interactions: List[Interaction] = []
 
-    if ASSISTANT_TYPE == "OpenAISuperPAF":
-        assistant = OpenAISuperPAF()
-        print("🚀 Initialized OpenAI Super Personal AI Assistant...")
-    elif ASSISTANT_TYPE == "OpenAIPAF":
-        assistant = OpenAIPAF()
-        print("🚀 Initialized OpenAI Personal AI Assistant...")
-    elif ASSISTANT_TYPE == "AssElevenPAF":
-        assistant = AssElevenPAF()
-        print("🚀 Initialized AssemblyAI-ElevenLabs Personal AI Assistant...")
-    elif ASSISTANT_TYPE == "GroqElevenPAF":
-        assistant = GroqElevenPAF()
-        print("🚀 Initialized Groq-ElevenLabs Personal AI Assistant...")
-    else:
-        raise ValueError(f"Invalid assistant type: {ASSISTANT_TYPE}")
+    assistant = build_assistant(ASSISTANT_TYPE)
+    with span("setup", assistant=assistant.__class__.__name__):
+        assistant.setup()
+    start_metrics_server()
 
-    assistant.setup()
+    summarizer = ConversationSummarizer() if SUMMARIZE_CONVERSATION else None
+    # Assistants that keep conversation state still get the full history in
+    # the prompt, they fall back to it whenever that state starts over
+    conversation = assistant.new_conversation() if assistant.manages_history else None
 
     while True:
         try:
             input("🎧 Press Enter to start recording...")
             recording = record_audio(duration=DURATION, fs=FS, channels=CHANNELS)
 
-            filename = create_audio_file(recording)
-            transcription = assistant.transcribe(filename)
+            # The turn starts when the human stops talking, so time_to_first_audio
+            # on the turn span is the latency they actually feel
+            with span("turn", assistant=assistant.__class__.__name__):
+                filename = create_audio_file(recording)
+                transcription = assistant.transcribe(filename)
 
-            print(f"📝 Your Input Transcription: '{transcription}'")
+                print(f"📝 Your Input Transcription: '{transcription}'")
 
-            prompt = build_prompt(transcription, previous_interactions)
-            response = assistant.think(prompt)
+                conversation_summary = ""
+                if summarizer:
+                    conversation_summary, previous_interactions = summarizer.context()
 
-            print(f"🤖 Your Personal AI Assistant Response: '{response}'")
+                prompt = build_prompt(
+                    transcription,
+                    previous_interactions,
+                    conversation_summary=conversation_summary,
+                )
+                if conversation is not None:
+                    response = assistant.think(
+                        prompt, conversation=conversation, latest_input=transcription
+                    )
+                else:
+                    response = assistant.think(prompt)
 
-            assistant.speak(response)
+                print(f"🤖 Your Personal AI Assistant Response: '{response}'")
 
-            os.remove(filename)
+                assistant.speak(response)
 
-            # Update previous interactions
-            previous_interactions.append(
-                Interaction(role="human", content=transcription)
-            )
-            previous_interactions.append(
-                Interaction(role="assistant", content=response)
-            )
+                os.remove(filename)
 
-            # Keep only the last CONVO_TRAIL_CUTOFF interactions
-            if len(previous_interactions) > CONVO_TRAIL_CUTOFF:
-                previous_interactions = previous_interactions[-CONVO_TRAIL_CUTOFF:]
+            # Update previous interactions
+            interactions = [
+                Interaction(role="human", content=transcription),
+                Interaction(role="assistant", content=response),
+            ]
+
+            if summarizer:
+                # Already spoken, so folding old turns stays off the critical path
+                summarizer.add(*interactions)
+            else:
+                previous_interactions.extend(interactions)
+
+                # Keep only the last CONVO_TRAIL_CUTOFF interactions
+                if len(previous_interactions) > CONVO_TRAIL_CUTOFF:
+                    previous_interactions = previous_interactions[-CONVO_TRAIL_CUTOFF:]
 
             print("\nReady for next interaction. Press Ctrl+C to exit.")
         except KeyboardInterrupt:
@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+from dotenv import load_dotenv
+from main import build_assistant, build_prompt
+from modules.provider_calls import BATCH, priority
+from modules.tracing import submit_in_context
+from modules.constants import (
+    ASSISTANT_TYPE,
+    BATCH_OUTPUT_DIR,
+    BATCH_MAX_WORKERS,
+    BATCH_PROVIDER_CONCURRENCY,
+    BATCH_AUDIO_EXTENSIONS,
+)
+
+load_dotenv()
+
+
+_provider_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_provider_semaphores_lock = threading.Lock()
+_output_lock = threading.Lock()
+
+
+def provider_slot(provider: str) -> threading.BoundedSemaphore:
+    """
+    One semaphore per provider so e.g. ElevenLabs and OpenAI are throttled independently.
+    """
+
+    with _provider_semaphores_lock:
+        if provider not in _provider_semaphores:
+            _provider_semaphores[provider] = threading.BoundedSemaphore(
+                BATCH_PROVIDER_CONCURRENCY.get(provider, 1)
+            )
+        return _provider_semaphores[provider]
+
+
+def load_jobs(source: str, tts: bool) -> List[dict]:
+    """
+    Load jobs from a directory of audio files or a JSONL file of jobs.
+
+    Each JSONL line is an object with an 'id' (optional) and either an 'audio'
+    path or a 'text' input. A per-job 'tts' overrides the --tts flag.
+
+    Jobs without an id get a hash of their content, so resuming after the file
+    was edited still skips the right jobs. Relative audio paths are relative
+    to the JSONL file.
+    """
+
+    jobs = []
+
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.lower().endswith(BATCH_AUDIO_EXTENSIONS):
+                continue
+            jobs.append({"id": name, "audio": os.path.join(source, name), "tts": tts})
+        return jobs
+
+    source_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r") as file:
+        for line_number, line in enumerate(file):
+            line = line.strip()
+            if not line:
+                continue
+            job = json.loads(line)
+            if "audio" not in job and "text" not in job:
+                raise ValueError(
+                    f"Job on line {line_number + 1} needs an 'audio' or 'text' field"
+                )
+            if "id" not in job:
+                content = json.dumps(job, sort_keys=True).encode()
+                job["id"] = hashlib.sha1(content).hexdigest()[:12]
+            job["id"] = str(job["id"])
+            if "audio" in job:
+                job["audio"] = os.path.join(source_dir, job["audio"])
+            job.setdefault("tts", tts)
+            jobs.append(job)
+
+    return jobs
+
+
+def load_completed_job_ids(output_file: str) -> set:
+    """
+    Read the results checkpoint and return ids of jobs that already succeeded.
+    """
+
+    completed = set()
+    if not os.path.exists(output_file):
+        return completed
+
+    with open(output_file, "r") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A half written line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+
+    return completed
+
+
+def write_result(output_file: str, record: dict):
+    with _output_lock:
+        with open(output_file, "a") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def safe_filename(job_id: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in job_id)
+
+
+def run_job(assistant, assistant_type: str, job: dict, audio_dir: str) -> dict:
+    """
+    transcribe -> think -> (optionally) speak to a file for a single job.
+    """
+
+    record = {"id": job["id"], "status": "ok", "durations": {}}
+
+    try:
+        if "audio" in job:
+            record["audio"] = job["audio"]
+            start_time = time.time()
+            with provider_slot(assistant.stt_provider):
+                transcription = assistant.transcribe(job["audio"])
+            record["durations"]["transcribe"] = round(time.time() - start_time, 2)
+        else:
+            transcription = job["text"]
+        record["transcription"] = transcription
+
+        start_time = time.time()
+        with provider_slot(assistant.llm_provider):
+            response = assistant.think(
+                build_prompt(transcription, [], assistant_type=assistant_type)
+            )
+        record["durations"]["think"] = round(time.time() - start_time, 2)
+        record["response"] = response
+
+        if job.get("tts") and response:
+            start_time = time.time()
+            with provider_slot(assistant.tts_provider):
+                audio_bytes, audio_format = (
+                    assistant.generate_voice_audio_with_format(response)
+                )
+            audio_path = os.path.join(
+                audio_dir, f"{safe_filename(job['id'])}.{audio_format}"
+            )
+            with open(audio_path, "wb") as file:
+                file.write(audio_bytes)
+            record["durations"]["speak"] = round(time.time() - start_time, 2)
+            record["response_audio"] = audio_path
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{e.__class__.__name__}: {str(e)}"
+
+    return record
+
+
+def main():
+    """
+    Batch process a directory of audio files or a JSONL of text/audio jobs.
+
+    Results are appended to a JSONL file as they finish. Re-running with the
+    same output file skips jobs that already succeeded, so an interrupted
+    overnight run picks up where it left off.
+    """
+
+    parser = argparse.ArgumentParser(description="Batch process assistant jobs")
+    parser.add_argument("source", help="Directory of audio files or a .jsonl of jobs")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(BATCH_OUTPUT_DIR, "results.jsonl"),
+        help="Results JSONL (also the resume checkpoint)",
+    )
+    parser.add_argument(
+        "--tts", action="store_true", help="Also speak each response to a file"
+    )
+    parser.add_argument("--assistant-type", default=ASSISTANT_TYPE)
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS)
+    args = parser.parse_args()
+
+    output_dir = os.path.dirname(args.output) or "."
+    audio_dir = os.path.join(output_dir, "audio")
+    os.makedirs(audio_dir, exist_ok=True)
+
+    jobs = load_jobs(args.source, args.tts)
+    completed = load_completed_job_ids(args.output)
+    pending = [job for job in jobs if job["id"] not in completed]
+
+    print(
+        f"📦 {len(jobs)} jobs found, {len(completed)} already done, {len(pending)} to run."
+    )
+    if not pending:
+        return
+
+    assistant = build_assistant(args.assistant_type)
+    assistant.setup()
+
+    failed = 0
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        # Batch work queues behind interactive turns on the shared rate limiters
+        with priority(BATCH):
+            futures = [
+                submit_in_context(
+                    executor, run_job, assistant, args.assistant_type, job, audio_dir
+                )
+                for job in pending
+            ]
+        for count, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            write_result(args.output, record)
+            if record["status"] == "ok":
+                print(f"✅ [{count}/{len(pending)}] {record['id']}")
+            else:
+                failed += 1
+                print(f"❌ [{count}/{len(pending)}] {record['id']}: {record['error']}")
+
+    print(
+        f"🏁 Batch complete in {time.time() - start_time:.2f} seconds. {failed} failed. Results in {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
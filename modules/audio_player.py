@@ -0,0 +1,54 @@
+from typing import Iterable
+import sounddevice as sd
+
+from modules.constants import TTS_PCM_SAMPLE_RATE, PLAYBACK_JITTER_BUFFER_MS
+from modules.tracing import mark, set_attribute, traced
+
+SAMPLE_WIDTH = 2  # int16
+
+
+@traced("play")
+def play_pcm_stream(
+    chunks: Iterable[bytes],
+    samplerate: int = TTS_PCM_SAMPLE_RATE,
+    channels: int = 1,
+    jitter_buffer_ms: int = PLAYBACK_JITTER_BUFFER_MS,
+):
+    """
+    Play raw int16 PCM in-process as it streams in from the TTS provider.
+
+    Output starts once `jitter_buffer_ms` of audio has arrived, so small gaps
+    between network chunks don't cause underruns. No external player process,
+    no waiting for the full utterance, no decode step.
+    """
+
+    frame_size = SAMPLE_WIDTH * channels
+    jitter_bytes = int(samplerate * jitter_buffer_ms / 1000) * frame_size
+
+    buffer = b""
+    played = 0
+    with sd.RawOutputStream(
+        samplerate=samplerate, channels=channels, dtype="int16"
+    ) as stream:
+        started = False
+        for chunk in chunks:
+            buffer += chunk
+            if not started and len(buffer) < jitter_bytes:
+                continue
+            started = True
+
+            # Only write whole frames, chunks can split a sample
+            writable = len(buffer) - len(buffer) % frame_size
+            if writable:
+                stream.write(buffer[:writable])
+                buffer = buffer[writable:]
+                mark("time_to_first_audio")
+                played += writable
+
+        writable = len(buffer) - len(buffer) % frame_size
+        if writable:
+            stream.write(buffer[:writable])
+            mark("time_to_first_audio")
+            played += writable
+
+    set_attribute("bytes_played", played)
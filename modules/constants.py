@@ -5,6 +5,11 @@ HUMAN_COMPANION_NAME = "Dan"
 
 CONVO_TRAIL_CUTOFF = 30
 
+SUMMARIZE_CONVERSATION = True  # Fold older interactions into a running summary in the background
+SUMMARY_TAIL_INTERACTIONS = 6  # Raw interactions kept verbatim after the summary
+SUMMARY_FOLD_BATCH = 4  # Interactions past the tail that trigger a fold, so it doesn't run every turn
+SUMMARY_MAX_WORDS = 200
+
 FS = 44100  # Sample rate
 CHANNELS = 1  # Mono audio
 DURATION = 30  # Duration of the recording in seconds
@@ -12,7 +17,55 @@ DURATION = 30  # Duration of the recording in seconds
 ELEVEN_LABS_PRIMARY_SOLID_VOICE = "WejK3H1m7MI9CHnIjW9K"
 ELEVEN_LABS_CRINGE_VOICE = "uyfkySFC5J00qZ6iLAdh"
 
+TTS_PCM_SAMPLE_RATE = 24000  # Raw PCM rate requested from ElevenLabs for streaming playback
+OPENAI_PCM_SAMPLE_RATE = 24000  # Fixed by OpenAI's pcm response format, not configurable
+PLAYBACK_JITTER_BUFFER_MS = 100  # Audio buffered before playback starts
+
 OPENAI_IMG_AGENT_DIR = "data/images/openai"
+IMAGE_STORE_MAX_VERSIONS = 200  # Older image versions (and their conversions/resizes) get deleted
+OPENAI_SUPER_STREAM_TOOL_CALLS = True  # Start image generation while the tool call is still streaming
+
+# --------------------------- TOOLS ---------------------------
+
+TOOL_PLUGIN_MODULES = []  # e.g. ["my_tools.weather"], imported at setup so their @register_tool runs
+TOOL_CONCURRENCY_LIMITS = {  # Max concurrent runs per tool concurrency class
+    "network": 4,
+    "cpu": 2,
+    "ui": 1,
+}
+
+# --------------------------- PROVIDER CALLS ---------------------------
+
+# (requests per second, burst) per "provider:model" or per "provider" as a fallback.
+# llm models are keyed by their needs_key ("openai", "claude", "gemini").
+PROVIDER_RATE_LIMITS = {
+    "openai": (8, 16),
+    "openai:dall-e-3": (0.1, 5),  # Tier 1 DALL-E 3 is 7 images / minute
+    "groq": (0.3, 5),  # 20 audio requests / minute
+    "assemblyai": (1, 5),
+    "elevenlabs": (2, 5),
+    "claude": (0.8, 5),
+    "gemini": (0.5, 5),
+}
+
+# --------------------------- TRACING ---------------------------
+
+TRACE_FILE = "data/traces/trace.json"  # Chrome trace event format, open in ui.perfetto.dev
+TRACE_FILE_MAX_MB = 50  # Then it moves to trace.1.json (replacing the previous one) and starts over
+METRICS_PORT = 9464  # Prometheus text metrics at http://127.0.0.1:9464/metrics
+
+# --------------------------- BATCH MODE ---------------------------
+
+BATCH_OUTPUT_DIR = "data/batch"
+BATCH_MAX_WORKERS = 8  # Jobs in flight at once
+BATCH_PROVIDER_CONCURRENCY = {  # Max concurrent calls per provider
+    "openai": 4,
+    "groq": 4,
+    "assemblyai": 2,
+    "elevenlabs": 2,
+    "router": 4,
+}
+BATCH_AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".aac", ".ogg", ".flac", ".webm")
 
 
 # --------------------------- ASSISTANT TYPES ---------------------------
@@ -25,6 +78,53 @@ ASSISTANT_TYPE = "OpenAISuperPAF"
 
 # ASSISTANT_TYPE = "AssElevenPAF"
 
+# ASSISTANT_TYPE = "HedgedPAF"
+
+# ASSISTANT_TYPE = "RouterPAF"
+
+# ASSISTANT_TYPE = "OllamaPAF"
+
+
+# --------------------------- HEDGING (HedgedPAF) ---------------------------
+
+HEDGED_ASSISTANT_TYPES = ["GroqElevenPAF", "OpenAIPAF"]  # First one speaks
+HEDGED_THINK_MODEL_IDS = ["gpt-4o-mini", "claude-3.5-sonnet"]
+HEDGE_MODE = "hedge"  # "hedge": duplicate after the primary's p90, "race": call N at once
+HEDGE_RACE_N = 2
+HEDGE_PERCENTILE = 90
+HEDGE_DEFAULT_DELAY = 2.0  # Seconds before hedging when there's no latency history yet
+
+
+# --------------------------- LOCAL LLM (OllamaPAF) ---------------------------
+
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_MODEL = "llama3.1:8b"
+OLLAMA_KEEP_ALIVE = "30m"  # How long the server keeps the model loaded after each call
+OLLAMA_WARMUP_PROMPT = "Say hi."  # Run once at setup so the first real turn is warm
+OLLAMA_REUSE_CONTEXT = True  # Continue from the previous turn's KV cache instead of resending history
+OLLAMA_MAX_CONTEXT_TOKENS = 6000  # Start a fresh context past this, keep under the model's num_ctx
+OLLAMA_SPEECH_BACKEND = "GroqElevenPAF"  # Which assistant transcribes and speaks for OllamaPAF
+# Sent instead of the full prompt while a conversation continues from its context
+OLLAMA_FOLLOW_UP_PROMPT = """<latest-input>
+    [[latest_input]]
+</latest-input>
+
+Your Conversational Response:"""
+
+
+# --------------------------- ROUTING (RouterPAF) ---------------------------
+
+# Candidates per stage, tried fastest/healthiest first
+ROUTER_STT_BACKENDS = ["GroqElevenPAF", "OpenAIPAF", "AssElevenPAF"]
+ROUTER_LLM_MODEL_IDS = ["gpt-4o-mini", "claude-3.5-sonnet", "gemini-1.5-pro-latest"]
+ROUTER_TTS_BACKENDS = ["GroqElevenPAF", "OpenAIPAF"]
+ROUTER_TIMEOUTS = {"stt": 15, "llm": 30, "tts": 20}  # Seconds per attempt
+ROUTER_MAX_RETRIES = 1  # Retries per backend before failing over
+ROUTER_RETRY_BACKOFF = 0.5  # Base seconds for jittered exponential backoff
+ROUTER_BREAKER_FAILURES = 3  # Consecutive failures that open a backend's circuit
+ROUTER_BREAKER_COOLDOWN = 30  # Seconds before a half-open trial call
+ROUTER_EXPLORE_RATE = 0.05  # Share of calls sent to a backend other than the best, so its latency stays known
+
 
 # ---------------------------- PROMPT
 
@@ -35,11 +135,15 @@ PERSONAL_AI_ASSISTANT_PROMPT_HEAD = f"""You are a friendly, ultra helpful, atten
     <rule>We both like short, concise, conversational interactions.</rule>
     <rule>You're responding to '{HUMAN_COMPANION_NAME}'s latest-input.</rule>
     <rule>Respond in a short, conversational matter. Exclude meta-data, markdown, dashes, asterisks, etc.</rule>
-    <rule>When building your response, consider our previous-interactions as well, but focus primarily on the latest-input.</rule>
+    <rule>When building your response, consider our conversation-summary and previous-interactions as well, but focus primarily on the latest-input.</rule>
     <rule>When you're asked for more details, add more details and be more verbose.</rule>
     <rule>Be friendly, helpful, and interested. Ask questions where appropriate.</rule>
 </instructions>
 
+<conversation-summary>
+    [[conversation_summary]]
+</conversation-summary>
+
 <previous-interactions>
     [[previous_interactions]]
 </previous-interactions>
@@ -58,62 +162,17 @@ OPENAI_SUPER_ASSISTANT_PROMPT_HEAD = f"""You are a friendly, ultra helpful, atte
     <rule>We both like short, concise, conversational interactions.</rule>
     <rule>You're responding to '{HUMAN_COMPANION_NAME}'s latest-input.</rule>
     <rule>Respond in a short, conversational matter. Exclude meta-data, markdown, dashes, asterisks, etc.</rule>
-    <rule>When building your response, consider our previous-interactions as well, but focus primarily on the latest-input.</rule>
+    <rule>When building your response, consider our conversation-summary and previous-interactions as well, but focus primarily on the latest-input.</rule>
     <rule>When you're asked for more details, add more details and be more verbose.</rule>
     <rule>Be friendly, helpful, and interested. Ask questions where appropriate.</rule>
     <rule>You can use various tools to run functionality for your human companion.</rule>
 </instructions>
 
-<tools>
-    <image-generation>
-        <name>generate_image</name>
-        <trigger>If the human companion requests an image, use this tool.</trigger>
-        <parameter-details>
-            <detail>
-                Unless otherwise specified, default quality to 'hd'.
-            </detail>
-            <detail>
-                If a user asks for a certain number of images, append additional prompts parameter with that number of prompts.
-            </detail>
-            <detail>
-                Be sure to create as many images as the user requested by adding them to the prompts parameter.
-            </detail>
-        </parameter-details>
-    </image-generation>
-    <image-conversion>
-        <name>convert_image</name>
-        <trigger>If the human companion requests an image format conversion, use this tool.</trigger>
-        <parameter-details>
-            <detail>
-                Ensure the image_format parameter is set to the desired format (e.g., 'jpg', 'png').
-            </detail>
-            <detail>
-                Use the version_numbers parameter to specify which image versions to convert.
-            </detail>
-        </parameter-details>
-    </image-conversion>
-    <image-resize>
-        <name>resize_image</name>
-        <trigger>If the human companion requests an image resize, use this tool.</trigger>
-        <parameter-details>
-            <detail>
-                Specify the desired width and height in pixels.
-            </detail>
-            <detail>
-                Use the version_numbers parameter to specify which image versions to resize.
-            </detail>
-        </parameter-details>
-    </image-resize>
-    <open-image-directory>
-        <name>open_image_directory</name>
-        <trigger>If the human companion requests to open the image directory, use this tool.</trigger>
-        <parameter-details>
-            <detail>
-                This tool doesn't require any parameters.
-            </detail>
-        </parameter-details>
-    </open-image-directory>
-</tools>
+[[tools]]
+
+<conversation-summary>
+    [[conversation_summary]]
+</conversation-summary>
 
 <previous-interactions>
     [[previous_interactions]]
@@ -124,3 +183,23 @@ OPENAI_SUPER_ASSISTANT_PROMPT_HEAD = f"""You are a friendly, ultra helpful, atte
 </latest-input>
 
 Your Conversational Response:"""
+
+
+CONVERSATION_SUMMARY_PROMPT = f"""You maintain a running summary of a conversation between '{HUMAN_COMPANION_NAME}' and their AI assistant '{PERSONAL_AI_ASSISTANT_NAME}'.
+
+<instructions>
+    <rule>Fold the new-interactions into the current-summary and return the updated summary.</rule>
+    <rule>Keep names, facts, decisions, preferences, open questions and anything {HUMAN_COMPANION_NAME} asked to remember.</rule>
+    <rule>Drop small talk and wording, keep meaning.</rule>
+    <rule>Use at most [[max_words]] words of plain text. Exclude meta-data, markdown, dashes, asterisks, etc.</rule>
+</instructions>
+
+<current-summary>
+    [[current_summary]]
+</current-summary>
+
+<new-interactions>
+    [[new_interactions]]
+</new-interactions>
+
+Updated Summary:"""
@@ -0,0 +1,121 @@
+"""
+Running conversation summary, so prompts stay the same size as a conversation grows.
+
+Older interactions are folded into the summary by the mini model in a
+background thread after the reply has been spoken. The prompt gets the summary
+plus a short tail of raw interactions instead of the whole trail.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from modules.constants import (
+    CONVERSATION_SUMMARY_PROMPT,
+    CONVO_TRAIL_CUTOFF,
+    SUMMARY_FOLD_BATCH,
+    SUMMARY_MAX_WORDS,
+    SUMMARY_TAIL_INTERACTIONS,
+)
+from modules.provider_calls import BATCH, priority
+from modules.tracing import set_attribute, span, submit_in_context
+from modules.typings import Interaction
+from modules.simple_llm import build_mini_model, prompt
+
+
+def format_interactions(interactions: List[Interaction]) -> str:
+    return "\n".join(
+        [
+            f"""<interaction>
+    <role>{interaction.role}</role>
+    <content>{interaction.content}</content>
+</interaction>"""
+            for interaction in interactions
+        ]
+    )
+
+
+class ConversationSummarizer:
+    """
+    Holds the running summary and the interactions not yet folded into it.
+
+    A fold takes everything older than the tail, so the tail's raw interactions
+    are never in the summary too. Only one fold runs at a time; turns that
+    finish during a fold just queue up for the next one.
+    """
+
+    def __init__(
+        self,
+        tail_interactions: int = SUMMARY_TAIL_INTERACTIONS,
+        fold_batch: int = SUMMARY_FOLD_BATCH,
+    ):
+        self.tail_interactions = tail_interactions
+        self.fold_batch = fold_batch
+        self.summary = ""
+        self.interactions: List[Interaction] = []
+        self._lock = threading.Lock()
+        self._folding = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="summarizer"
+        )
+
+    def context(self) -> Tuple[str, List[Interaction]]:
+        """
+        The summary and the raw interactions that follow it, for build_prompt.
+        """
+
+        with self._lock:
+            return self.summary, list(self.interactions)
+
+    def add(self, *interactions: Interaction):
+        """
+        Record a finished turn and start a fold in the background if enough
+        interactions have piled up past the tail. Never blocks on the model.
+        """
+
+        with self._lock:
+            self.interactions.extend(interactions)
+
+            # If folds keep failing, fall back to dropping the oldest like before
+            if len(self.interactions) > CONVO_TRAIL_CUTOFF:
+                del self.interactions[:-CONVO_TRAIL_CUTOFF]
+
+            foldable = len(self.interactions) - self.tail_interactions
+            if self._folding or foldable < self.fold_batch:
+                return
+            self._folding = True
+            summary = self.summary
+            to_fold = self.interactions[:foldable]
+
+        # Queue behind interactive turns on the shared rate limiters
+        with priority(BATCH):
+            submit_in_context(self._executor, self._fold, summary, to_fold)
+
+    def _fold(self, summary: str, to_fold: List[Interaction]):
+        try:
+            with span("summarize", interactions=len(to_fold)):
+                summary_prompt = (
+                    CONVERSATION_SUMMARY_PROMPT.replace(
+                        "[[max_words]]", str(SUMMARY_MAX_WORDS)
+                    )
+                    .replace("[[current_summary]]", summary or "None yet.")
+                    .replace("[[new_interactions]]", format_interactions(to_fold))
+                )
+                new_summary = prompt(build_mini_model(), summary_prompt).strip()
+                set_attribute("summary_chars", len(new_summary))
+
+            with self._lock:
+                self.summary = new_summary
+                # add() only appends, and may have trimmed the head if it ran past
+                # CONVO_TRAIL_CUTOFF, so drop the folded interactions by identity
+                folded = {id(interaction) for interaction in to_fold}
+                self.interactions = [
+                    interaction
+                    for interaction in self.interactions
+                    if id(interaction) not in folded
+                ]
+        except Exception as e:
+            print(f"⚠️ Conversation summary failed, keeping raw interactions: {e}")
+        finally:
+            with self._lock:
+                self._folding = False
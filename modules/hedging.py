@@ -0,0 +1,177 @@
+import glob
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from modules.tracing import submit_in_context
+
+# (name, zero-arg callable) - name is the key latencies are tracked under
+Candidate = Tuple[str, Callable[[], Any]]
+
+
+class LatencyTracker:
+    """
+    Rolling window of call durations per key, e.g. 'GroqElevenPAF.transcribe'.
+    """
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._durations: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, duration: float):
+        with self._lock:
+            if key not in self._durations:
+                self._durations[key] = deque(maxlen=self.window)
+            self._durations[key].append(duration)
+
+    def percentile(self, key: str, p: float) -> Optional[float]:
+        with self._lock:
+            durations = sorted(self._durations.get(key, []))
+        if not durations:
+            return None
+        index = min(len(durations) - 1, int(round(p / 100 * (len(durations) - 1))))
+        return durations[index]
+
+    def seed_from_time_tables(self, pattern: str = "*_time_table.json"):
+        """
+        Warm the tracker from the *_time_table.json files timeit_decorator writes.
+        Records are newest first, so only the newest `window` per key are kept.
+        """
+
+        for json_file in glob.glob(pattern):
+            try:
+                with open(json_file, "r") as file:
+                    data = json.load(file)
+            except (OSError, json.JSONDecodeError):
+                continue
+            for record in reversed(data[: self.window * 10]):
+                try:
+                    key = f"{record['assistant']}.{record['function']}"
+                    self.record(key, float(record["duration"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+
+latency_tracker = LatencyTracker()
+
+# Shared by hedged and raced calls, router attempts and prompt fan-out. Losers
+# and timed out calls can't be interrupted mid-request, they finish here in the
+# background and their results are dropped.
+background_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="call")
+
+
+def completions(
+    futures: Dict[Future, Any], next_timeout: Callable[[], Optional[float]]
+) -> Iterator[Optional[Future]]:
+    """
+    Yield futures from `futures` as they complete, or None when next_timeout()
+    seconds pass without one. The caller pops what it handles and may add new
+    futures between yields; stops once `futures` is empty.
+    """
+
+    while futures:
+        done, _ = wait(
+            list(futures), timeout=next_timeout(), return_when=FIRST_COMPLETED
+        )
+        if not done:
+            yield None
+        for future in done:
+            if future in futures:
+                yield future
+
+
+def _timed(name: str, fn: Callable[[], Any]) -> Callable[[], Any]:
+    def run():
+        start_time = time.time()
+        result = fn()
+        latency_tracker.record(name, time.time() - start_time)
+        return result
+
+    return run
+
+
+def order_by_latency(candidates: List[Candidate]) -> List[Candidate]:
+    """
+    Fastest median first. Candidates without history keep their configured order.
+    """
+
+    def sort_key(item):
+        position, (name, _) = item
+        p50 = latency_tracker.percentile(name, 50)
+        return (p50 is None, p50 or 0, position)
+
+    return [candidate for _, candidate in sorted(enumerate(candidates), key=sort_key)]
+
+
+def _first_success(
+    futures: Dict[Future, str], pending_starts: List[Candidate], hedge_delay
+):
+    """
+    Wait for the first successful future, starting the next candidate whenever
+    hedge_delay passes (or a running one fails) without a winner.
+    """
+
+    errors = []
+
+    def start_next():
+        name, fn = pending_starts.pop(0)
+        futures[submit_in_context(background_executor, _timed(name, fn))] = name
+
+    if not futures and pending_starts:
+        start_next()
+
+    for future in completions(futures, lambda: hedge_delay if pending_starts else None):
+        if future is None:
+            print(f"🏇 Hedging with {pending_starts[0][0]}...")
+            start_next()
+            continue
+
+        name = futures.pop(future)
+        if future.exception() is None:
+            for loser in futures:
+                loser.cancel()
+            return name, future.result()
+        print(f"🟡 {name} failed: {future.exception()}")
+        errors.append(future.exception())
+        if not futures and pending_starts:
+            start_next()
+
+    raise RuntimeError(f"All candidates failed: {errors}")
+
+
+def hedged_call(
+    candidates: List[Candidate],
+    default_delay: float = 2.0,
+    percentile: float = 90,
+) -> Tuple[str, Any]:
+    """
+    Call the fastest candidate. If it runs past its historical p90 latency, also
+    call the next one. The first success wins and the rest are cancelled.
+    """
+
+    ordered = order_by_latency(candidates)
+    primary_name = ordered[0][0]
+    hedge_delay = latency_tracker.percentile(primary_name, percentile) or default_delay
+
+    name, fn = ordered[0]
+    futures = {submit_in_context(background_executor, _timed(name, fn)): name}
+    return _first_success(futures, ordered[1:], hedge_delay)
+
+
+def race(candidates: List[Candidate], n: Optional[int] = None) -> Tuple[str, Any]:
+    """
+    Call the n fastest candidates at once and return the first success.
+    """
+
+    ordered = order_by_latency(candidates)
+    n = len(ordered) if n is None else n
+    futures = {
+        submit_in_context(background_executor, _timed(name, fn)): name
+        for name, fn in ordered[:n]
+    }
+    # Anything past n is only tried if all n fail
+    return _first_success(futures, ordered[n:], hedge_delay=None)
@@ -0,0 +1,180 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+INDEX_FILE = "index.json"
+
+
+class ImageStore:
+    """
+    Versioned image directory backed by a JSON index.
+
+    Every generated image gets a new, never reused version id, so a new
+    request can't overwrite an earlier image. Lookups go through the in-memory
+    index instead of probing the filesystem, and old versions (with their
+    converted/resized derivatives) are garbage-collected past `max_versions`.
+    """
+
+    def __init__(self, directory: str, max_versions: int):
+        self.directory = directory
+        self.max_versions = max_versions
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load()
+
+    def _load(self) -> dict:
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                try:
+                    return json.load(file)
+                except json.JSONDecodeError:
+                    print(
+                        f"🟡 Warning: {self.index_path} is corrupt, rebuilding it from the image files."
+                    )
+
+        self._index = self._import_legacy_files()
+        self._save()
+        return self._index
+
+    def _import_legacy_files(self) -> dict:
+        """
+        First run on an existing directory: index the version_N.png images
+        (and their conversions / resizes) from before the index, so they can
+        still be converted, resized and garbage-collected, and start numbering
+        after them so nothing gets overwritten. Conversions and resizes whose
+        version_N.png is gone are indexed under a version without an image
+        (path None), so they still get garbage-collected.
+        """
+
+        highest = 0
+        versions = {}
+        derivatives = {}
+        for name in sorted(os.listdir(self.directory)):
+            match = re.match(r"version_(\d+)(.*)$", name)
+            if not match:
+                continue
+            version, suffix = int(match.group(1)), match.group(2)
+            highest = max(highest, version)
+            if suffix == ".png":
+                versions[str(version)] = {
+                    "path": name,
+                    "created_at": os.path.getmtime(os.path.join(self.directory, name)),
+                    "derivatives": [],
+                    "legacy": True,
+                }
+                continue
+
+            resized = re.match(r"_resized_w(\d+)_h(\d+)\.png$", suffix)
+            if resized:
+                derivative = {
+                    "path": name,
+                    "kind": "resize",
+                    "width": int(resized.group(1)),
+                    "height": int(resized.group(2)),
+                }
+            else:
+                derivative = {
+                    "path": name,
+                    "kind": "convert",
+                    "image_format": suffix.lstrip("."),
+                }
+            derivatives.setdefault(str(version), []).append(derivative)
+
+        for version, version_derivatives in derivatives.items():
+            if version not in versions:
+                paths = [d["path"] for d in version_derivatives]
+                versions[version] = {
+                    "path": None,
+                    "created_at": max(
+                        os.path.getmtime(os.path.join(self.directory, path))
+                        for path in paths
+                    ),
+                    "legacy": True,
+                }
+            versions[version]["derivatives"] = version_derivatives
+
+        if versions:
+            print(f"🖼️ Indexed {len(versions)} existing image versions")
+        return {"next_version": highest + 1, "versions": versions}
+
+    def _save(self):
+        # Write then rename so a crash never leaves a half written index
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self._index, file, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def reserve_version(self) -> int:
+        with self._lock:
+            version = self._index["next_version"]
+            self._index["next_version"] += 1
+            self._save()
+            return version
+
+    def path_for(self, version: int, suffix: str = ".png") -> str:
+        return os.path.join(self.directory, f"version_{version}{suffix}")
+
+    def add_version(self, version: int, path: str, **attributes):
+        with self._lock:
+            self._index["versions"][str(version)] = {
+                "path": os.path.basename(path),
+                "created_at": time.time(),
+                "derivatives": [],
+                **attributes,
+            }
+            self._save()
+
+    def get(self, version: int) -> Optional[Dict]:
+        with self._lock:
+            record = self._index["versions"].get(str(version))
+            return dict(record) if record else None
+
+    def image_path(self, version: int) -> Optional[str]:
+        record = self.get(version)
+        if record is None or record["path"] is None:
+            return None
+        return os.path.join(self.directory, record["path"])
+
+    def add_derivative(self, version: int, path: str, **attributes):
+        with self._lock:
+            record = self._index["versions"].get(str(version))
+            if record is None:
+                return
+            name = os.path.basename(path)
+            # Converting or resizing again overwrites the same file
+            record["derivatives"] = [
+                d for d in record["derivatives"] if d["path"] != name
+            ] + [{"path": name, **attributes}]
+            self._save()
+
+    def versions(self) -> List[int]:
+        with self._lock:
+            return sorted(int(version) for version in self._index["versions"])
+
+    def collect_garbage(self) -> List[int]:
+        """
+        Delete everything but the newest `max_versions` versions. Returns the
+        versions removed.
+        """
+
+        with self._lock:
+            versions = sorted(int(version) for version in self._index["versions"])
+            expired = versions[: max(0, len(versions) - self.max_versions)]
+            for version in expired:
+                record = self._index["versions"].pop(str(version))
+                paths = [record["path"]] + [d["path"] for d in record["derivatives"]]
+                for path in filter(None, paths):
+                    try:
+                        os.remove(os.path.join(self.directory, path))
+                    except FileNotFoundError:
+                        pass
+            if expired:
+                self._save()
+
+        if expired:
+            print(f"🧹 Removed {len(expired)} old image versions")
+        return expired
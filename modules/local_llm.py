@@ -0,0 +1,84 @@
+"""
+Thin client for a local Ollama compatible server.
+
+llm-ollama covers plain prompting, but keeping the model resident (keep_alive)
+and reusing the KV cache between turns (context) need the native API.
+"""
+
+import json
+import threading
+from typing import List, Optional, Tuple
+import requests
+
+from modules.constants import OLLAMA_HOST
+from modules.tracing import mark, set_attribute, span
+
+
+class Conversation:
+    """
+    The server context of one conversation. Never share one between unrelated
+    prompts, they'd continue from each other's state.
+    """
+
+    def __init__(self):
+        self.context: List[int] = []
+        self.lock = threading.Lock()
+
+
+def preload(model: str, keep_alive: str):
+    """
+    Load the model into memory and keep it there for `keep_alive`.
+    A generate request without a prompt only loads the model.
+    """
+
+    with span("ollama.preload", model=model):
+        response = requests.post(
+            f"{OLLAMA_HOST}/api/generate",
+            json={"model": model, "keep_alive": keep_alive},
+            timeout=300,
+        )
+        response.raise_for_status()
+
+
+def generate(
+    model: str,
+    prompt: str,
+    keep_alive: str,
+    context: Optional[List[int]] = None,
+    options: Optional[dict] = None,
+) -> Tuple[str, List[int]]:
+    """
+    Stream a completion. Passing the `context` from the previous call continues
+    from that conversation state, so the server skips re-processing it.
+
+    Returns the text and the new context.
+    """
+
+    payload = {"model": model, "prompt": prompt, "keep_alive": keep_alive}
+    if context:
+        payload["context"] = context
+    if options:
+        payload["options"] = options
+
+    with span("ollama.generate", model=model, prompt_chars=len(prompt)):
+        chunks = []
+        new_context = []
+        with requests.post(
+            f"{OLLAMA_HOST}/api/generate", json=payload, stream=True, timeout=300
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama error: {data['error']}")
+                if data.get("response"):
+                    mark("time_to_first_token")
+                    chunks.append(data["response"])
+                if data.get("done"):
+                    new_context = data.get("context", [])
+                    set_attribute("input_tokens", data.get("prompt_eval_count"))
+                    set_attribute("output_tokens", data.get("eval_count"))
+
+        return "".join(chunks), new_context
@@ -0,0 +1,118 @@
+"""
+Tolerant parser for JSON that is still being streamed, e.g. tool call arguments.
+
+Only values that can't change as more text arrives are returned: a string is
+included once its closing quote arrives, a number once something follows it.
+Objects and arrays are returned as soon as they open, holding whatever complete
+children they have so far. So for
+
+    {"quality": "hd", "prompts": ["a cat", "a d
+
+you get {"quality": "hd", "prompts": ["a cat"]}.
+"""
+
+import json
+from typing import Any, Tuple
+
+_INCOMPLETE = object()
+_WHITESPACE = " \t\n\r"
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+def parse_partial_json(text: str) -> Any:
+    """
+    Parse as much of `text` as is final. Returns None if nothing is yet.
+    """
+
+    value, _ = _parse_value(text, _skip_whitespace(text, 0))
+    return None if value is _INCOMPLETE else value
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index] in _WHITESPACE:
+        index += 1
+    return index
+
+
+def _parse_value(text: str, index: int) -> Tuple[Any, int]:
+    if index >= len(text):
+        return _INCOMPLETE, index
+
+    char = text[index]
+    if char == "{":
+        return _parse_object(text, index + 1)
+    if char == "[":
+        return _parse_array(text, index + 1)
+    if char == '"':
+        return _parse_string(text, index)
+    if char in "-0123456789":
+        return _parse_number(text, index)
+    for literal, value in _LITERALS.items():
+        if text.startswith(literal, index):
+            return value, index + len(literal)
+    return _INCOMPLETE, len(text)
+
+
+def _parse_string(text: str, index: int) -> Tuple[Any, int]:
+    end = index + 1
+    while end < len(text):
+        if text[end] == "\\":
+            end += 2
+            continue
+        if text[end] == '"':
+            return json.loads(text[index : end + 1]), end + 1
+        end += 1
+    return _INCOMPLETE, len(text)
+
+
+def _parse_number(text: str, index: int) -> Tuple[Any, int]:
+    end = index
+    while end < len(text) and text[end] in "+-0123456789.eE":
+        end += 1
+    if end >= len(text):
+        # More digits may still be on the way
+        return _INCOMPLETE, end
+    return json.loads(text[index:end]), end
+
+
+def _parse_array(text: str, index: int) -> Tuple[Any, int]:
+    items = []
+    while True:
+        index = _skip_whitespace(text, index)
+        if index >= len(text):
+            return items, index
+        if text[index] == "]":
+            return items, index + 1
+        if text[index] == ",":
+            index += 1
+            continue
+        value, index = _parse_value(text, index)
+        if value is _INCOMPLETE:
+            return items, index
+        items.append(value)
+
+
+def _parse_object(text: str, index: int) -> Tuple[Any, int]:
+    result = {}
+    while True:
+        index = _skip_whitespace(text, index)
+        if index >= len(text):
+            return result, index
+        if text[index] == "}":
+            return result, index + 1
+        if text[index] == ",":
+            index += 1
+            continue
+
+        key, index = _parse_string(text, index)
+        if key is _INCOMPLETE:
+            return result, index
+        index = _skip_whitespace(text, index)
+        if index >= len(text) or text[index] != ":":
+            return result, len(text)
+        index = _skip_whitespace(text, index + 1)
+
+        value, index = _parse_value(text, index)
+        if value is _INCOMPLETE:
+            return result, index
+        result[key] = value
@@ -0,0 +1,276 @@
+"""
+Shared layer every provider call goes through.
+
+- Single-flight: identical calls already in flight share one result instead of
+  hitting the API again. Retries and deliberate repeats opt out with
+  independent_calls().
+- Token bucket rate limiters per provider/model, sized from PROVIDER_RATE_LIMITS,
+  so bursts queue locally instead of turning into 429s and retry storms.
+- Priorities: waiters are served lowest priority value first, so interactive
+  turns go ahead of background batch work queued on the same limiter.
+- Admission: callers with their own timeouts (the router) can learn when a call
+  got past the limiters, so local queueing isn't blamed on the provider, and
+  give up on a call that is still queued.
+"""
+
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from modules.constants import PROVIDER_RATE_LIMITS
+
+INTERACTIVE = 0
+BATCH = 10
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "provider_call_priority", default=INTERACTIVE
+)
+_share_in_flight: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "provider_call_share_in_flight", default=True
+)
+_admission: contextvars.ContextVar[Optional["Admission"]] = contextvars.ContextVar(
+    "provider_call_admission", default=None
+)
+
+
+@contextmanager
+def priority(level: int):
+    """
+    Run provider calls made inside the block at the given priority.
+    """
+
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def independent_calls():
+    """
+    Provider calls made inside the block always send their own request rather
+    than joining an identical one in flight - for retries, which would otherwise
+    wait on the very call that just timed out, and for sampling a model several
+    times on purpose.
+    """
+
+    token = _share_in_flight.set(False)
+    try:
+        yield
+    finally:
+        _share_in_flight.reset(token)
+
+
+class CallAbandoned(Exception):
+    """
+    The caller gave up on the call before the rate limiter let it through.
+    """
+
+
+class Admission:
+    """
+    Where a call is in the rate limiters: `queued` once it waits for a token,
+    `admitted` once it has one (or joined an identical call already in flight).
+    """
+
+    def __init__(self):
+        self.queued = threading.Event()
+        self.admitted = threading.Event()
+        self.admitted_at: Optional[float] = None
+        self.abandoned = threading.Event()
+        self._bucket: Optional["TokenBucket"] = None
+
+    def admit(self):
+        if not self.admitted.is_set():
+            self.admitted_at = time.time()
+            self.admitted.set()
+
+    def abandon(self):
+        """
+        Give up on a call still queued for a token, it leaves the queue without
+        taking one. No effect once the call has been admitted.
+        """
+
+        self.abandoned.set()
+        if self._bucket is not None:
+            self._bucket.wake()
+
+
+@contextmanager
+def track_admission(admission: Admission):
+    """
+    Report the progress of provider calls made inside the block to `admission`.
+    """
+
+    token = _admission.set(admission)
+    try:
+        yield
+    finally:
+        _admission.reset(token)
+
+
+def _mark_admitted():
+    admission = _admission.get()
+    if admission is not None:
+        admission.admit()
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, holding at most `burst`. Waiters queue by
+    (priority, arrival) and only the head of the queue may take a token.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def acquire(
+        self, level: int = INTERACTIVE, abandoned: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Wait for a token. False if `abandoned` was set first (see wake()).
+        """
+
+        with self._condition:
+            ticket = (level, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if abandoned is not None and abandoned.is_set():
+                        return False
+                    self._refill()
+                    is_head = self._waiters[0] == ticket
+                    if is_head and self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    # The head sleeps until its token is due, the rest until woken
+                    timeout = (1 - self._tokens) / self.rate if is_head else None
+                    self._condition.wait(timeout=timeout)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def wake(self):
+        """
+        Wake every waiter so the abandoned ones can leave the queue.
+        """
+
+        with self._condition:
+            self._condition.notify_all()
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one. Results aren't
+    cached - once the call finishes, the next one with that key runs again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            # Joining a call that's already out, nothing to queue for here
+            _mark_admitted()
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+
+_buckets: Dict[str, Optional[TokenBucket]] = {}
+_buckets_lock = threading.Lock()
+_single_flight = SingleFlight()
+
+
+def _bucket(provider: str, model: str) -> Optional[TokenBucket]:
+    """
+    Most specific limit wins: 'provider:model', then 'provider'. None = unlimited.
+    """
+
+    name = f"{provider}:{model}"
+    with _buckets_lock:
+        if name not in _buckets:
+            limit = PROVIDER_RATE_LIMITS.get(name) or PROVIDER_RATE_LIMITS.get(provider)
+            if limit is None:
+                _buckets[name] = None
+            elif name in PROVIDER_RATE_LIMITS:
+                _buckets[name] = TokenBucket(*limit)
+            else:
+                # Models without their own limit share the provider's bucket
+                if provider not in _buckets:
+                    _buckets[provider] = TokenBucket(*limit)
+                _buckets[name] = _buckets[provider]
+        return _buckets[name]
+
+
+def rate_limit(provider: str, model: str):
+    """
+    Block until the provider/model limiter lets a call through.
+    """
+
+    bucket = _bucket(provider, model)
+    if bucket is not None:
+        admission = _admission.get()
+        abandoned = None
+        if admission is not None:
+            admission._bucket = bucket
+            admission.queued.set()
+            abandoned = admission.abandoned
+        if not bucket.acquire(_priority.get(), abandoned):
+            raise CallAbandoned(f"{provider}:{model} call abandoned while queued")
+    _mark_admitted()
+
+
+def provider_call(
+    provider: str,
+    model: str,
+    fn: Callable[[], Any],
+    key: Optional[Hashable] = None,
+) -> Any:
+    """
+    Rate limit and run fn. With a key, identical in-flight calls share a result
+    (and a single rate limit token).
+    """
+
+    def run():
+        rate_limit(provider, model)
+        return fn()
+
+    if key is None or not _share_in_flight.get():
+        return run()
+    return _single_flight.do((provider, model, key), run)
@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from modules.hedging import Candidate, background_executor, latency_tracker
+from modules.provider_calls import Admission, independent_calls, track_admission
+from modules.tracing import submit_in_context
+
+
+class QueueTimeout(TimeoutError):
+    """
+    A call spent its whole timeout waiting for a local rate limit token.
+    """
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures.
+    open -> half-open after `cooldown` seconds, letting a single trial call through.
+    half-open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.time() - self.opened_at >= self.cooldown:
+                self.state = "half-open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if (
+                self.state == "half-open"
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.time()
+
+
+class Router:
+    """
+    Picks a backend per call from rolling latency and error stats, with timeouts,
+    jittered retries, a circuit breaker per backend, and failover down the list.
+    """
+
+    def __init__(
+        self,
+        timeouts: Dict[str, float],
+        max_retries: int = 1,
+        backoff: float = 0.5,
+        breaker_failures: int = 3,
+        breaker_cooldown: float = 30.0,
+        error_window: int = 20,
+        explore_rate: float = 0.05,
+    ):
+        self.timeouts = timeouts
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.error_window = error_window
+        self.explore_rate = explore_rate
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.outcomes: Dict[str, Deque[bool]] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(
+                    self.breaker_failures, self.breaker_cooldown
+                )
+            return self.breakers[name]
+
+    def error_rate(self, name: str) -> float:
+        with self._lock:
+            outcomes = list(self.outcomes.get(name, []))
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def _record_outcome(self, name: str, success: bool):
+        with self._lock:
+            if name not in self.outcomes:
+                self.outcomes[name] = deque(maxlen=self.error_window)
+            self.outcomes[name].append(success)
+
+    def score(self, name: str, position: int):
+        """
+        Lower is better: expected latency inflated by the recent error rate.
+        Backends without history sort after known ones, in configured order.
+        """
+
+        p50 = latency_tracker.percentile(name, 50)
+        if p50 is None:
+            return (1, position)
+        return (0, p50 * (1 + 4 * self.error_rate(name)))
+
+    def order(self, candidates: List[Candidate]) -> List[Candidate]:
+        scored = sorted(
+            enumerate(candidates), key=lambda item: self.score(item[1][0], item[0])
+        )
+        ordered = [candidate for _, candidate in scored]
+
+        # Latency is only learned from successful calls, so without exploring
+        # the first backend with history would win forever. Now and then put
+        # another one first, preferring backends we know nothing about yet.
+        if len(ordered) > 1 and random.random() < self.explore_rate:
+            others = ordered[1:]
+            unknown = [
+                c for c in others if latency_tracker.percentile(c[0], 50) is None
+            ]
+            explored = random.choice(unknown or others)
+            ordered.remove(explored)
+            ordered.insert(0, explored)
+            print(f"🧭 Exploring {explored[0]}")
+        return ordered
+
+    def _attempt(
+        self,
+        name: str,
+        fn,
+        timeout: Optional[float],
+        discard: Optional[Callable[[Any], None]] = None,
+    ):
+        admission = Admission()
+
+        def run():
+            # A retry must not join the attempt that just timed out
+            with track_admission(admission), independent_calls():
+                try:
+                    return fn()
+                finally:
+                    admission.admit()
+
+        future = submit_in_context(background_executor, run)
+        start_time = time.time()
+        admitted = admission.admitted.wait(timeout)
+        if admission.queued.is_set():
+            if not admitted:
+                # Stuck behind other calls on our own rate limiter, another
+                # backend may answer sooner
+                admission.abandon()
+                self._abandon(future, discard)
+                raise QueueTimeout(
+                    f"{name} waited {timeout} seconds for a rate limit token"
+                )
+            # Waiting on our own rate limiters isn't the provider being slow, so
+            # the timeout (and the latency stats) start once the call is let through
+            start_time = admission.admitted_at
+        remaining = None
+        if timeout is not None:
+            remaining = max(0.0, timeout - (time.time() - start_time))
+        try:
+            result = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            self._abandon(future, discard)
+            raise TimeoutError(f"{name} timed out after {timeout} seconds")
+        latency_tracker.record(name, time.time() - start_time)
+        return result
+
+    @staticmethod
+    def _abandon(future: Future, discard: Optional[Callable[[Any], None]]):
+        if not future.cancel() and discard is not None:
+            # Clean up whatever the abandoned call returns once it finishes
+            future.add_done_callback(
+                lambda f: f.exception() is None and discard(f.result())
+            )
+
+    def call(
+        self,
+        stage: str,
+        candidates: List[Candidate],
+        discard: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """
+        Try candidates best first until one succeeds. `discard` is called with
+        the result of any attempt that finishes after it timed out, e.g. to
+        close a stream nobody will read.
+        """
+
+        errors = []
+        timeout = self.timeouts.get(stage)
+
+        for name, fn in self.order(candidates):
+            breaker = self.breaker(name)
+            if not breaker.allow():
+                continue
+
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    # Full jitter so retries from concurrent turns don't sync up
+                    time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+                try:
+                    result = self._attempt(name, fn, timeout, discard)
+                except QueueTimeout as e:
+                    # Our own queue, not the provider's fault - no breaker
+                    # failure, but retrying would only queue again
+                    print(f"🟡 {stage} via {name} skipped: {e}")
+                    errors.append(e)
+                    break
+                except Exception as e:
+                    print(f"🟡 {stage} via {name} failed: {e}")
+                    errors.append(e)
+                    self._record_outcome(name, False)
+                    breaker.record_failure()
+                    if not breaker.allow():
+                        break
+                    continue
+                self._record_outcome(name, True)
+                breaker.record_success()
+                print(f"🧭 {stage} routed to {name}")
+                return result
+
+        raise RuntimeError(f"No {stage} backend succeeded: {errors}")
@@ -1,79 +1,289 @@
+import functools
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Union
 import llm
 from dotenv import load_dotenv
 import os
+from modules.tracing import mark, set_attribute, span, submit_in_context
+from modules.typings import MajorityResult, ModelResult
+from modules.hedging import background_executor, completions
+from modules.provider_calls import independent_calls, provider_call
 
 load_dotenv()
 
 
 def prompt(model: llm.Model, prompt: str):
-    res = model.prompt(prompt)
-    return res.text()
+    # Identical prompts already in flight against the same model share a result
+    return provider_call(
+        getattr(model, "needs_key", None) or "local",
+        model.model_id,
+        functools.partial(_prompt, model, prompt),
+        key=prompt,
+    )
+
+
+def _prompt(model: llm.Model, prompt: str):
+    with span("llm.prompt", model=model.model_id, prompt_chars=len(prompt)):
+        res = model.prompt(prompt)
+        chunks = []
+        # Iterating streams the response where the model supports it
+        for chunk in res:
+            mark("time_to_first_token")
+            chunks.append(chunk)
+        usage = getattr(res, "usage", None)
+        if callable(usage):
+            usage = usage()
+            set_attribute("input_tokens", getattr(usage, "input", None))
+            set_attribute("output_tokens", getattr(usage, "output", None))
+        return "".join(chunks)
 
 
 def get_model_name(model: llm.Model):
     return model.model_id
 
 
-def build_models():
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+_get_model_lock = threading.Lock()
 
-    sonnet_3_5_model: llm.Model = llm.get_model("claude-3.5-sonnet")
-    sonnet_3_5_model.key = ANTHROPIC_API_KEY
 
-    return sonnet_3_5_model
+@functools.lru_cache(maxsize=None)
+def get_model(model_id: str, key_env_var: Optional[str] = None) -> llm.Model:
+    """
+    Build a model once per process. Keys are read from the environment on
+    first use only.
+    """
 
+    # llm loads its plugins on the first lookup and marks them loaded before
+    # it's done, so concurrent first lookups can miss every plugin model
+    with _get_model_lock:
+        model: llm.Model = llm.get_model(model_id)
+    if key_env_var:
+        model.key = os.getenv(key_env_var)
+    return model
 
-def build_big_3_models():
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-    sonnet_3_5_model: llm.Model = llm.get_model("claude-3.5-sonnet")
-    sonnet_3_5_model.key = ANTHROPIC_API_KEY
+def build_models():
+    return get_model("claude-3.5-sonnet", "ANTHROPIC_API_KEY")
 
-    gpt4_o_model: llm.Model = llm.get_model("4o")
-    gpt4_o_model.key = OPENAI_API_KEY
 
-    gemini_1_5_pro_model: llm.Model = llm.get_model("gemini-1.5-pro-latest")
-    gemini_1_5_pro_model.key = GEMINI_API_KEY
+def build_big_3_models():
+    sonnet_3_5_model = get_model("claude-3.5-sonnet", "ANTHROPIC_API_KEY")
+    gpt4_o_model = get_model("4o", "OPENAI_API_KEY")
+    gemini_1_5_pro_model = get_model("gemini-1.5-pro-latest", "GEMINI_API_KEY")
 
     return sonnet_3_5_model, gpt4_o_model, gemini_1_5_pro_model
 
 
 def build_big_3_plus_mini_models():
+    sonnet_3_5_model, gpt4_o_model, gemini_1_5_pro_model = build_big_3_models()
+    gpt4_o_mini_model = build_mini_model()
 
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    return sonnet_3_5_model, gpt4_o_model, gemini_1_5_pro_model, gpt4_o_mini_model
 
-    sonnet_3_5_model: llm.Model = llm.get_model("claude-3.5-sonnet")
-    sonnet_3_5_model.key = ANTHROPIC_API_KEY
 
-    gpt4_o_model: llm.Model = llm.get_model("4o")
-    gpt4_o_model.key = OPENAI_API_KEY
+def build_mini_model():
+    return get_model("gpt-4o-mini", "OPENAI_API_KEY")
 
-    gemini_1_5_pro_model: llm.Model = llm.get_model("gemini-1.5-pro-latest")
-    gemini_1_5_pro_model.key = GEMINI_API_KEY
 
-    gpt4_o_mini_model: llm.Model = llm.get_model("gpt-4o-mini")
-    gpt4_o_mini_model.key = OPENAI_API_KEY
+def build_new_gpt4o():
+    return get_model("gpt-4o-2024-08-06", "OPENAI_API_KEY")
 
-    return sonnet_3_5_model, gpt4_o_model, gemini_1_5_pro_model, gpt4_o_mini_model
 
+# Key env var per alias, for model lists configured in constants.py
+MODEL_KEY_ENV_VARS = {
+    "claude-3.5-sonnet": "ANTHROPIC_API_KEY",
+    "4o": "OPENAI_API_KEY",
+    "gpt-4o-mini": "OPENAI_API_KEY",
+    "gpt-4o-2024-08-06": "OPENAI_API_KEY",
+    "gemini-1.5-pro-latest": "GEMINI_API_KEY",
+}
 
-def build_mini_model():
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-    gpt4_o_mini_model: llm.Model = llm.get_model("gpt-4o-mini")
-    gpt4_o_mini_model.key = OPENAI_API_KEY
+def build_models_by_alias(aliases: List[str]) -> List[llm.Model]:
+    """
+    Build just the configured models. llm resolves aliases, so the built
+    model's model_id may differ from the alias asked for.
+    """
 
-    return gpt4_o_mini_model
+    return [get_model(alias, MODEL_KEY_ENV_VARS.get(alias)) for alias in aliases]
 
 
-def build_new_gpt4o():
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# --------------------------- FAN OUT ---------------------------
+
+def _timed_prompt(model: llm.Model, prompt_text: str) -> ModelResult:
+    start_time = time.time()
+    try:
+        # The same model may be listed more than once to sample it repeatedly
+        with independent_calls():
+            text = prompt(model, prompt_text)
+        return ModelResult(
+            model_id=model.model_id, text=text, duration=time.time() - start_time
+        )
+    except Exception as e:
+        return ModelResult(
+            model_id=model.model_id,
+            error=f"{e.__class__.__name__}: {str(e)}",
+            duration=time.time() - start_time,
+        )
+
+
+def stream_prompt_many(
+    models: List[llm.Model],
+    prompt_text: str,
+    timeout: Union[None, float, Dict[str, float]] = None,
+) -> Iterator[ModelResult]:
+    """
+    Send one prompt to every model concurrently and yield results as they land.
+
+    timeout is seconds for every model, or a {model_id: seconds} dict. A model
+    that runs past its timeout is yielded as an error result.
+    """
+
+    start_time = time.time()
+    deadlines = {}
+    futures = {}
+    for model in models:
+        future = submit_in_context(
+            background_executor, _timed_prompt, model, prompt_text
+        )
+        futures[future] = model.model_id
+        model_timeout = timeout
+        if isinstance(timeout, dict):
+            model_timeout = timeout.get(model.model_id)
+        if model_timeout is not None:
+            deadlines[future] = start_time + model_timeout
+
+    def next_timeout():
+        pending_deadlines = [deadlines[f] for f in futures if f in deadlines]
+        if not pending_deadlines:
+            return None
+        return max(0, min(pending_deadlines) - time.time())
+
+    for future in completions(futures, next_timeout):
+        if future is not None:
+            futures.pop(future)
+            yield future.result()
+
+        now = time.time()
+        for expired in [f for f in futures if deadlines.get(f, now + 1) <= now]:
+            model_id = futures.pop(expired)
+            expired.cancel()
+            yield ModelResult(
+                model_id=model_id,
+                error=f"Timed out after {now - start_time:.2f} seconds",
+                duration=now - start_time,
+            )
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().strip().rstrip(".!").split())
+
+
+def same_normalized_answer(a: str, b: str) -> bool:
+    """
+    Default agreement test: equal after normalizing case, whitespace and
+    trailing punctuation. Only useful for short answers (yes/no, a number, a
+    label) - pass your own test for free-form text.
+    """
+
+    return _normalize(a) == _normalize(b)
+
+
+def prompt_many(
+    models: List[llm.Model],
+    prompt_text: str,
+    mode: str = "all",
+    k: int = 1,
+    timeout: Union[None, float, Dict[str, float]] = None,
+) -> List[ModelResult]:
+    """
+    Fan one prompt out to N models concurrently.
+
+    mode="all": every result (including errors and timeouts), in completion order.
+    mode="first_k": the first k successful results, the rest are abandoned.
+
+    For a vote across the models use prompt_majority().
+    """
+
+    if mode not in ("all", "first_k"):
+        raise ValueError(f"Invalid fan out mode: {mode}")
+
+    results = []
+    for result in stream_prompt_many(models, prompt_text, timeout):
+        results.append(result)
+        successes = [r for r in results if r.text is not None]
+
+        if mode == "first_k" and len(successes) >= k:
+            return successes[:k]
+
+    if mode == "first_k":
+        return [r for r in results if r.text is not None]
+    return results
+
+
+def prompt_majority(
+    models: List[llm.Model],
+    prompt_text: str,
+    timeout: Union[None, float, Dict[str, float]] = None,
+    same_answer: Callable[[str, str], bool] = same_normalized_answer,
+) -> MajorityResult:
+    """
+    Fan one prompt out to N models and stop as soon as more than half of them
+    agree according to `same_answer`.
+
+    Check `reached` on the result: without a majority, `answer` is only the
+    most common answer, not a consensus.
+    """
+
+    results = []
+    for result in stream_prompt_many(models, prompt_text, timeout):
+        results.append(result)
+        agreeing = _largest_group(results, same_answer)
+        if len(agreeing) > len(models) / 2:
+            return MajorityResult(
+                reached=True,
+                answer=agreeing[0].text,
+                agreeing=agreeing,
+                results=results,
+            )
+
+    agreeing = _largest_group(results, same_answer)
+    return MajorityResult(
+        reached=False,
+        answer=agreeing[0].text if agreeing else None,
+        agreeing=agreeing,
+        results=results,
+    )
+
+
+def _largest_group(
+    results: List[ModelResult], same_answer: Callable[[str, str], bool]
+) -> List[ModelResult]:
+    """
+    Group successful results by answer, each compared to the group's first
+    result, and return the biggest group (the earliest one on ties).
+    """
+
+    groups: List[List[ModelResult]] = []
+    for result in results:
+        if result.text is None:
+            continue
+        for group in groups:
+            if same_answer(group[0].text, result.text):
+                group.append(result)
+                break
+        else:
+            groups.append([result])
+    return max(groups, key=len, default=[])
+
 
-    gpt4_o_model: llm.Model = llm.get_model("gpt-4o-2024-08-06")
-    gpt4_o_model.key = OPENAI_API_KEY
+def consensus(
+    results: List[ModelResult],
+    same_answer: Callable[[str, str], bool] = same_normalized_answer,
+) -> Optional[str]:
+    """
+    The most common answer among successful results (not necessarily a majority).
+    """
 
-    return gpt4_o_model
+    agreeing = _largest_group(results, same_answer)
+    return agreeing[0].text if agreeing else None
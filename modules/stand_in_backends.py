@@ -0,0 +1,167 @@
+"""
+Local stand-in for the OpenAI endpoints OpenAIPAF uses, for load and soak tests.
+
+Point the openai client (and llm's OpenAI models, which use it) here with
+OPENAI_BASE_URL and every transcribe / think / speak call stays on this
+machine, with provider-like latency and payload sizes but no cost.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.constants import OPENAI_PCM_SAMPLE_RATE
+
+
+class StandInConfig:
+    def __init__(
+        self,
+        transcribe_latency: float = 0.4,
+        think_latency: float = 0.6,
+        speak_latency: float = 0.3,
+        error_rate: float = 0.0,
+        reply_words: int = 40,
+        speech_seconds: float = 3.0,
+    ):
+        # Latencies are medians, actual latency is lognormal around them
+        self.transcribe_latency = transcribe_latency
+        self.think_latency = think_latency
+        self.speak_latency = speak_latency
+        self.error_rate = error_rate
+        self.reply_words = reply_words
+        self.speech_seconds = speech_seconds
+
+
+TRANSCRIPTIONS = [
+    "Hey, what's a good name for a golden retriever?",
+    "Can you remind me what we talked about earlier?",
+    "Give me three ideas for dinner tonight.",
+    "How long would it take to drive to the coast?",
+]
+
+
+def _sleep_around(median: float):
+    time.sleep(median * random.lognormvariate(0, 0.35))
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    config: StandInConfig = StandInConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data: dict, status: int = 200):
+        self._send(status, json.dumps(data).encode(), "application/json")
+
+    def do_POST(self):
+        body = self._read_body()
+
+        if random.random() < self.config.error_rate:
+            self._send_json({"error": {"message": "stand-in overloaded"}}, status=503)
+            return
+
+        if self.path.endswith("/audio/transcriptions"):
+            _sleep_around(self.config.transcribe_latency)
+            # Vary the text so identical prompts don't coalesce across sessions
+            text = f"{random.choice(TRANSCRIPTIONS)} ({random.randint(0, 10**6)})"
+            self._send_json({"text": text})
+        elif self.path.endswith("/chat/completions"):
+            self._chat_completion(json.loads(body or b"{}"))
+        elif self.path.endswith("/audio/speech"):
+            _sleep_around(self.config.speak_latency)
+            samples = int(OPENAI_PCM_SAMPLE_RATE * self.config.speech_seconds)
+            self._send(200, b"\x00\x00" * samples, "audio/pcm")
+        else:
+            error = {"message": f"No stand-in for {self.path}"}
+            self._send_json({"error": error}, status=404)
+
+    def _chat_completion(self, request: dict):
+        model = request.get("model", "stand-in")
+        words = ["word"] * self.config.reply_words
+        usage = {
+            "prompt_tokens": 100,
+            "completion_tokens": len(words),
+            "total_tokens": 100 + len(words),
+        }
+        _sleep_around(self.config.think_latency)
+
+        if not request.get("stream"):
+            self._send_json(
+                {
+                    "id": "chatcmpl-stand-in",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": " ".join(words),
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+            return
+
+        def chunk(delta: dict, finish_reason=None) -> bytes:
+            data = {
+                "id": "chatcmpl-stand-in",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            return f"data: {json.dumps(data)}\n\n".encode()
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": f"{word} "}) for word in words]
+        events.append(chunk({}, finish_reason="stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = {
+                "id": "chatcmpl-stand-in",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            events.append(f"data: {json.dumps(usage_chunk)}\n\n".encode())
+        events.append(b"data: [DONE]\n\n")
+
+        body = b"".join(events)
+        self._send(200, body, "text/event-stream")
+
+
+def start_stand_in_server(
+    config: StandInConfig, port: int = 0
+) -> ThreadingHTTPServer:
+    """
+    Serve the stand-in on 127.0.0.1 in a daemon thread. Port 0 picks a free port,
+    read it back from server.server_address.
+    """
+
+    handler = type("StandInHandler", (_StandInHandler,), {"config": config})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,163 @@
+"""
+Declarative tool registry for OpenAISuperPAF.
+
+Each tool is registered once with its pydantic params model and handler. The
+OpenAI function schemas and the <tools> prompt section are generated from the
+registry and cached, so think() doesn't rebuild them every turn.
+
+Third-party tools register from their own module and get listed in
+TOOL_PLUGIN_MODULES - no edits to assistants.py needed:
+
+    @register_tool(
+        WeatherParams,
+        trigger="If the human companion asks about the weather, use this tool.",
+        concurrency="network",
+    )
+    def get_weather(assistant, params: WeatherParams) -> bool:
+        ...
+"""
+
+import functools
+import importlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type, Union
+
+import openai
+from pydantic import BaseModel
+
+from modules.constants import TOOL_CONCURRENCY_LIMITS
+
+
+class ToolResult:
+    """
+    The outcome of one tool call. Handlers can return a plain bool, or this to
+    pass a note for the model (e.g. the new image versions) and data back to
+    the caller - never via the assistant, which concurrent calls share.
+    """
+
+    def __init__(self, success: bool, note: Optional[str] = None, data: Any = None):
+        self.success = success
+        self.note = note
+        self.data = data
+
+
+class Tool:
+    def __init__(
+        self,
+        name: str,
+        params_model: Type[BaseModel],
+        handler: Callable[..., Union[bool, ToolResult]],
+        trigger: str,
+        details: Sequence[str],
+        concurrency: str,
+        cost_hint: Optional[str],
+    ):
+        self.name = name
+        self.params_model = params_model
+        self.handler = handler
+        self.trigger = trigger
+        self.details = list(details)
+        self.concurrency = concurrency
+        self.cost_hint = cost_hint
+
+    @property
+    def description(self) -> str:
+        return " ".join([self.trigger] + self.details)
+
+    def run(self, assistant, params: BaseModel) -> ToolResult:
+        if self.cost_hint:
+            print(f"💸 {self.name} cost: {self.cost_hint}")
+        with concurrency_slot(self.concurrency):
+            result = self.handler(assistant, params)
+        return result if isinstance(result, ToolResult) else ToolResult(bool(result))
+
+
+_tools: Dict[str, Tool] = {}
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def concurrency_slot(concurrency: str) -> threading.BoundedSemaphore:
+    """
+    Tools in the same concurrency class (network, cpu, ui...) share a limit.
+    """
+
+    with _slots_lock:
+        if concurrency not in _slots:
+            _slots[concurrency] = threading.BoundedSemaphore(
+                TOOL_CONCURRENCY_LIMITS.get(concurrency, 1)
+            )
+        return _slots[concurrency]
+
+
+def register_tool(
+    params_model: Type[BaseModel],
+    trigger: str,
+    details: Sequence[str] = (),
+    concurrency: str = "network",
+    cost_hint: Optional[str] = None,
+    name: Optional[str] = None,
+):
+    """
+    Register the decorated handler(assistant, params) -> bool | ToolResult as a tool.
+
+    The tool name defaults to the params model name, which is also the function
+    name the model calls.
+    """
+
+    def decorator(handler):
+        tool_name = name or params_model.__name__
+        _tools[tool_name] = Tool(
+            tool_name, params_model, handler, trigger, details, concurrency, cost_hint
+        )
+        # New tool, regenerate schemas and prompt on next use
+        tool_schemas.cache_clear()
+        tools_prompt.cache_clear()
+        return handler
+
+    return decorator
+
+
+def get_tool(name: str) -> Optional[Tool]:
+    return _tools.get(name)
+
+
+def get_tools() -> List[Tool]:
+    return list(_tools.values())
+
+
+@functools.lru_cache(maxsize=None)
+def tool_schemas() -> tuple:
+    return tuple(
+        openai.pydantic_function_tool(
+            tool.params_model, name=tool.name, description=tool.description
+        )
+        for tool in _tools.values()
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def tools_prompt() -> str:
+    """
+    The <tools> prompt section. Parameter details already travel in each
+    function's schema description, so only the name and trigger go here.
+    """
+
+    tools = "\n".join(
+        f"""    <tool>
+        <name>{tool.name}</name>
+        <trigger>{tool.trigger}</trigger>
+    </tool>"""
+        for tool in _tools.values()
+    )
+    return f"<tools>\n{tools}\n</tools>"
+
+
+def load_tool_plugins(module_names: Sequence[str]):
+    """
+    Import plugin modules so their @register_tool decorators run.
+    """
+
+    for module_name in module_names:
+        importlib.import_module(module_name)
+        print(f"🧩 Loaded tool plugin: {module_name}")
@@ -0,0 +1,270 @@
+"""
+Span based tracing for assistant turns.
+
+Spans nest through a contextvar (turn -> think -> tool -> image download) and
+carry attributes. Finished spans are
+
+- appended to TRACE_FILE in Chrome trace event format - open it in
+  https://ui.perfetto.dev or chrome://tracing for a flame chart. Past
+  TRACE_FILE_MAX_MB it moves to a .1 file and a new one starts
+- folded into Prometheus histograms served as text on METRICS_PORT
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from modules.constants import TRACE_FILE, TRACE_FILE_MAX_MB, METRICS_PORT
+
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    def __init__(
+        self, name: str, attributes: Dict[str, Any], parent: Optional["Span"]
+    ):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def mark(self, metric: str):
+        """
+        Record seconds since span start, e.g. time_to_first_token, once per span.
+        """
+
+        if metric not in self.attributes:
+            elapsed = time.time() - self.start
+            self.attributes[metric] = round(elapsed, 4)
+            metrics.observe(f"paf_{metric}_seconds", elapsed, {"span": self.name})
+
+
+class Metrics:
+    """
+    Minimal thread safe histogram registry rendered in Prometheus text format.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, Dict[tuple, Dict[str, Any]]] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, labels: Dict[str, str]):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {}).setdefault(
+                key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def increment(self, name: str, labels: Dict[str, str], amount: float = 1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + amount
+
+    @staticmethod
+    def _labels(key: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in key]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series_by_labels in self._histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for key, series in series_by_labels.items():
+                    for bound, count in zip(self.buckets, series["buckets"]):
+                        le = 'le="' + str(bound) + '"'
+                        lines.append(f"{name}_bucket{self._labels(key, le)} {count}")
+                    le = 'le="+Inf"'
+                    lines.append(
+                        f"{name}_bucket{self._labels(key, le)} {series['count']}"
+                    )
+                    lines.append(f"{name}_sum{self._labels(key)} {series['sum']}")
+                    lines.append(f"{name}_count{self._labels(key)} {series['count']}")
+            for name, counter in self._counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for key, value in counter.items():
+                    lines.append(f"{name}{self._labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+_trace_file_lock = threading.Lock()
+_trace_file_started = False
+_trace_file_bytes = 0
+
+
+def _rotated_trace_file() -> str:
+    root, ext = os.path.splitext(TRACE_FILE)
+    return f"{root}.1{ext}"
+
+
+def _export(span: Span):
+    global _trace_file_started, _trace_file_bytes
+
+    metrics.observe("paf_span_duration_seconds", span.duration, {"span": span.name})
+    if span.error:
+        metrics.increment("paf_span_errors_total", {"span": span.name})
+
+    event = {
+        "name": span.name,
+        "ph": "X",
+        "ts": int(span.start * 1_000_000),
+        "dur": int(span.duration * 1_000_000),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": {k: str(v) for k, v in span.attributes.items()},
+    }
+    if span.parent is not None:
+        event["args"]["parent"] = span.parent.name
+    if span.error:
+        event["args"]["error"] = span.error
+
+    with _trace_file_lock:
+        # The trace event format allows an unterminated JSON array, so events
+        # can be appended as they finish without rewriting the file
+        # Start over if the file was removed while running, e.g. by a cleanup
+        if not _trace_file_started or not os.path.exists(TRACE_FILE):
+            os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+            with open(TRACE_FILE, "w") as file:
+                file.write("[\n")
+            _trace_file_started = True
+            _trace_file_bytes = 2
+        elif _trace_file_bytes >= TRACE_FILE_MAX_MB * 1024 * 1024:
+            # Keep the previous file only, so long sessions don't fill the disk
+            os.replace(TRACE_FILE, _rotated_trace_file())
+            with open(TRACE_FILE, "w") as file:
+                file.write("[\n")
+            _trace_file_bytes = 2
+        line = json.dumps(event) + ",\n"
+        with open(TRACE_FILE, "a") as file:
+            file.write(line)
+        _trace_file_bytes += len(line.encode())
+
+
+@contextmanager
+def span(name: str, **attributes):
+    parent = _current_span.get()
+    current = Span(name, attributes, parent)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{e.__class__.__name__}: {str(e)}"
+        raise
+    finally:
+        current.end = time.time()
+        _current_span.reset(token)
+        _export(current)
+
+
+def traced(name: Optional[str] = None):
+    """
+    Decorator version of span(), named after the function by default.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any):
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+
+def mark(metric: str):
+    """
+    Mark the current span and the root span (the turn), so e.g.
+    time_to_first_audio is known both per speak() and per user turn.
+    """
+
+    current = _current_span.get()
+    if current is None:
+        return
+    current.mark(metric)
+    root = current
+    while root.parent is not None:
+        root = root.parent
+    if root is not current:
+        root.mark(metric)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit() that carries the current span into the worker thread.
+    """
+
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the assistant's console output
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    except OSError as e:
+        # Metrics are optional, e.g. another assistant already has the port
+        print(f"⚠️ Metrics server not started on port {port}: {e}")
+        return None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"📈 Metrics at http://127.0.0.1:{port}/metrics, traces in {TRACE_FILE}")
+    return server
@@ -35,10 +35,12 @@ class Quality(str, Enum):
 
 
 class GenerateImageParams(BaseModel):
-    prompts: List[str]
+    # prompts goes last so the model writes the settings first, letting
+    # streamed tool calls start each image as soon as its prompt is complete
     quality: Quality
     image_ratio: Optional[ImageRatio]
     style: Optional[Style]
+    prompts: List[str]
 
 
 class ImageFormat(str, Enum):
@@ -62,3 +64,19 @@ class ResizeImageParams(BaseModel):
 
 class OpenImageDirParams(BaseModel):
     pass
+
+
+class ModelResult(BaseModel):
+    model_id: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    duration: float
+
+
+class MajorityResult(BaseModel):
+    # reached is False when no answer got more than half the models, answer
+    # and agreeing then hold the most common answer so far
+    reached: bool
+    answer: Optional[str] = None
+    agreeing: List[ModelResult]
+    results: List[ModelResult]
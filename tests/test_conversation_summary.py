@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from modules import conversation_summary
+from modules.constants import CONVO_TRAIL_CUTOFF
+from modules.conversation_summary import ConversationSummarizer
+from modules.typings import Interaction
+
+
+class FakeSummaryModel:
+    """
+    Replaces prompt(): records the prompts and answers "summary N", or waits
+    for `release` first when it's set.
+    """
+
+    def __init__(self, release=None, error=None):
+        self.prompts = []
+        self.release = release
+        self.error = error
+
+    def __call__(self, model, prompt_text):
+        self.prompts.append(prompt_text)
+        if self.release is not None:
+            self.release.wait(2)
+        if self.error:
+            raise self.error
+        return f" summary {len(self.prompts)} "
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(monkeypatch, tmp_path):
+    # Fold spans get exported to TRACE_FILE, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(conversation_summary, "build_mini_model", lambda: None)
+
+
+def use_model(monkeypatch, **kwargs) -> FakeSummaryModel:
+    model = FakeSummaryModel(**kwargs)
+    monkeypatch.setattr(conversation_summary, "prompt", model)
+    return model
+
+
+def turns(*contents):
+    return [Interaction(role="human", content=content) for content in contents]
+
+
+def wait_for_fold(summarizer: ConversationSummarizer):
+    deadline = time.time() + 2
+    while summarizer._folding:
+        assert time.time() < deadline, "fold didn't finish"
+        time.sleep(0.005)
+
+
+def test_no_fold_until_a_batch_is_past_the_tail(monkeypatch):
+    model = use_model(monkeypatch)
+    summarizer = ConversationSummarizer(tail_interactions=2, fold_batch=2)
+    summarizer.add(*turns("a", "b", "c"))
+    wait_for_fold(summarizer)
+    assert model.prompts == []
+    assert summarizer.context() == ("", turns("a", "b", "c"))
+
+
+def test_fold_summarizes_everything_older_than_the_tail(monkeypatch):
+    model = use_model(monkeypatch)
+    summarizer = ConversationSummarizer(tail_interactions=2, fold_batch=2)
+    summarizer.add(*turns("a", "b", "c", "d"))
+    wait_for_fold(summarizer)
+
+    summary, tail = summarizer.context()
+    assert summary == "summary 1"
+    assert [i.content for i in tail] == ["c", "d"]
+    assert "<content>a</content>" in model.prompts[0]
+    assert "<content>c</content>" not in model.prompts[0]
+
+
+def test_next_fold_builds_on_the_summary(monkeypatch):
+    model = use_model(monkeypatch)
+    summarizer = ConversationSummarizer(tail_interactions=2, fold_batch=2)
+    summarizer.add(*turns("a", "b", "c", "d"))
+    wait_for_fold(summarizer)
+    summarizer.add(*turns("e", "f"))
+    wait_for_fold(summarizer)
+
+    assert "summary 1" in model.prompts[1]
+    assert summarizer.context()[0] == "summary 2"
+    assert [i.content for i in summarizer.context()[1]] == ["e", "f"]
+
+
+def test_turns_during_a_fold_are_kept(monkeypatch):
+    release = threading.Event()
+    use_model(monkeypatch, release=release)
+    summarizer = ConversationSummarizer(tail_interactions=2, fold_batch=2)
+    summarizer.add(*turns("a", "b", "c", "d"))
+    summarizer.add(*turns("e", "f"))
+    release.set()
+    wait_for_fold(summarizer)
+
+    # Only the fold that was running happened, e and f wait for the next one
+    summary, tail = summarizer.context()
+    assert summary == "summary 1"
+    assert [i.content for i in tail] == ["c", "d", "e", "f"]
+
+
+def test_failed_fold_keeps_the_raw_interactions(monkeypatch, capsys):
+    use_model(monkeypatch, error=RuntimeError("down"))
+    summarizer = ConversationSummarizer(tail_interactions=2, fold_batch=2)
+    summarizer.add(*turns("a", "b", "c", "d"))
+    wait_for_fold(summarizer)
+
+    assert summarizer.context() == ("", turns("a", "b", "c", "d"))
+    assert "Conversation summary failed" in capsys.readouterr().out
+
+
+def test_raw_interactions_stay_capped_when_folds_keep_failing(monkeypatch):
+    use_model(monkeypatch, error=RuntimeError("down"))
+    summarizer = ConversationSummarizer(tail_interactions=2, fold_batch=2)
+    for n in range(CONVO_TRAIL_CUTOFF + 10):
+        summarizer.add(*turns(str(n)))
+        wait_for_fold(summarizer)
+
+    _, tail = summarizer.context()
+    assert len(tail) == CONVO_TRAIL_CUTOFF
+    assert tail[-1].content == str(CONVO_TRAIL_CUTOFF + 9)
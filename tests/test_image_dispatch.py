@@ -0,0 +1,127 @@
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from modules.partial_json import parse_partial_json
+from modules.tool_registry import ToolResult, get_tool
+
+try:
+    from assistants.assistants import OpenAISuperPAF
+except OSError as e:
+    # sounddevice raises OSError when the PortAudio library is missing
+    pytest.skip(f"assistants can't be imported: {e}", allow_module_level=True)
+
+
+ARGUMENTS = {
+    "quality": "hd",
+    "image_ratio": "1024x1024",
+    "style": "vivid",
+    "prompts": ["a fox", 'a fox saying "hi"', "a fox"],
+}
+
+
+class RecordingExecutor:
+    """
+    Records what would be submitted instead of running it.
+    """
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        # submit_in_context() submits context.run(fn, *args)
+        self.submitted.append(args)
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def dispatch_prefixes(text: str):
+    assistant = OpenAISuperPAF()
+    executor = RecordingExecutor()
+    futures = []
+    for end in range(len(text) + 1):
+        arguments = parse_partial_json(text[:end])
+        if isinstance(arguments, dict):
+            assistant._dispatch_ready_images(arguments, executor, futures)
+    return executor.submitted
+
+
+def test_waits_for_every_setting():
+    executor = RecordingExecutor()
+    futures = []
+    OpenAISuperPAF()._dispatch_ready_images(
+        {"quality": "hd", "prompts": ["a fox"]}, executor, futures
+    )
+    assert executor.submitted == []
+
+
+def test_only_new_prompts_start_each_time():
+    assistant = OpenAISuperPAF()
+    executor = RecordingExecutor()
+    futures = []
+
+    assistant._dispatch_ready_images(
+        {**ARGUMENTS, "prompts": ARGUMENTS["prompts"][:2]}, executor, futures
+    )
+    assistant._dispatch_ready_images(ARGUMENTS, executor, futures)
+    assistant._dispatch_ready_images(ARGUMENTS, executor, futures)
+
+    assert [args[2].prompts for args in executor.submitted] == [
+        ["a fox"],
+        ['a fox saying "hi"'],
+        ["a fox"],
+    ]
+
+
+def test_runs_through_the_tool_registry():
+    executor = RecordingExecutor()
+    OpenAISuperPAF()._dispatch_ready_images(ARGUMENTS, executor, [])
+
+    run, _, params = executor.submitted[0]
+    assert run == get_tool("GenerateImageParams").run
+    assert params.quality.value == "hd"
+    assert params.style.value == "vivid"
+
+
+def test_streamed_arguments_start_each_prompt_once_and_complete():
+    # Every prefix of the streamed arguments, as the deltas arrive
+    submitted = dispatch_prefixes(json.dumps(ARGUMENTS))
+    assert [args[2].prompts[0] for args in submitted] == ARGUMENTS["prompts"]
+
+
+def test_settings_after_prompts_hold_back_dispatch():
+    arguments = {"prompts": ["a fox"], "quality": "hd", "image_ratio": None}
+    text = json.dumps({**arguments, "style": "vivid"})
+    submitted = dispatch_prefixes(text)
+    assert [args[2].prompts for args in submitted] == [["a fox"]]
+
+
+def test_tool_run_returns_versions(monkeypatch, capsys, tmp_path):
+    # Tool spans get exported to TRACE_FILE, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    assistant = OpenAISuperPAF()
+    versions = iter([7, 8])
+
+    class Store:
+        def collect_garbage(self):
+            return []
+
+    assistant.image_store = Store()
+    monkeypatch.setattr(
+        assistant, "_generate_one_image", lambda prompt, params: next(versions)
+    )
+
+    executor = ThreadPoolExecutor(2)
+    futures = []
+    assistant._dispatch_ready_images(
+        {**ARGUMENTS, "prompts": ARGUMENTS["prompts"][:2]}, executor, futures
+    )
+    results = [future.result() for future in futures]
+    executor.shutdown()
+
+    assert all(isinstance(result, ToolResult) for result in results)
+    assert sorted(v for result in results for v in result.data) == [7, 8]
+    # Cost hint printed by Tool.run for each image
+    assert capsys.readouterr().out.count("💸") == 2
@@ -0,0 +1,85 @@
+import os
+
+from modules.image_store import ImageStore
+
+
+def touch(directory, *names):
+    for name in names:
+        open(os.path.join(directory, name), "w").close()
+
+
+def test_new_versions_are_never_reused(tmp_path):
+    store = ImageStore(str(tmp_path), max_versions=10)
+    first = store.reserve_version()
+    second = store.reserve_version()
+    assert second == first + 1
+
+    # The counter survives a restart
+    assert ImageStore(str(tmp_path), max_versions=10).reserve_version() == second + 1
+
+
+def test_legacy_images_are_indexed_with_their_derivatives(tmp_path):
+    touch(
+        tmp_path,
+        "version_1.png",
+        "version_1.jpeg",
+        "version_1_resized_w64_h32.png",
+        "notes.txt",
+    )
+    store = ImageStore(str(tmp_path), max_versions=10)
+
+    assert store.versions() == [1]
+    assert store.image_path(1) == os.path.join(str(tmp_path), "version_1.png")
+    assert store.get(1)["derivatives"] == [
+        {"path": "version_1.jpeg", "kind": "convert", "image_format": "jpeg"},
+        {
+            "path": "version_1_resized_w64_h32.png",
+            "kind": "resize",
+            "width": 64,
+            "height": 32,
+        },
+    ]
+    assert store.reserve_version() == 2
+
+
+def test_orphaned_legacy_derivatives_are_indexed(tmp_path):
+    touch(tmp_path, "version_1.png", "version_3.jpeg")
+    store = ImageStore(str(tmp_path), max_versions=10)
+
+    assert store.versions() == [1, 3]
+    # No image to convert or resize, but it can still be collected
+    assert store.image_path(3) is None
+    assert store.reserve_version() == 4
+
+
+def test_repeated_derivative_replaces_the_entry(tmp_path):
+    store = ImageStore(str(tmp_path), max_versions=10)
+    version = store.reserve_version()
+    store.add_version(version, store.path_for(version))
+    for _ in range(2):
+        store.add_derivative(
+            version, store.path_for(version, ".jpg"), kind="convert", image_format="jpg"
+        )
+    assert len(store.get(version)["derivatives"]) == 1
+
+
+def test_garbage_collection_removes_the_oldest_versions_and_their_files(tmp_path):
+    touch(tmp_path, "version_1.png", "version_1.jpeg", "version_2.jpeg")
+    store = ImageStore(str(tmp_path), max_versions=1)
+    version = store.reserve_version()
+    touch(tmp_path, f"version_{version}.png")
+    store.add_version(version, store.path_for(version))
+
+    assert store.collect_garbage() == [1, 2]
+    assert store.versions() == [version]
+    assert sorted(os.listdir(tmp_path)) == ["index.json", f"version_{version}.png"]
+
+
+def test_corrupt_index_is_rebuilt_from_the_files(tmp_path, capsys):
+    touch(tmp_path, "version_5.png")
+    with open(os.path.join(tmp_path, "index.json"), "w") as file:
+        file.write("{not json")
+
+    store = ImageStore(str(tmp_path), max_versions=10)
+    assert store.versions() == [5]
+    assert "corrupt" in capsys.readouterr().out
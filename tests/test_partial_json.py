@@ -0,0 +1,67 @@
+from modules.partial_json import parse_partial_json
+
+
+def test_complete_json_matches_json_loads():
+    text = '{"quality": "hd", "n": 2, "ok": true, "none": null, "prompts": ["a", "b"]}'
+    assert parse_partial_json(text) == {
+        "quality": "hd",
+        "n": 2,
+        "ok": True,
+        "none": None,
+        "prompts": ["a", "b"],
+    }
+
+
+def test_nothing_final_yet():
+    assert parse_partial_json("") is None
+    assert parse_partial_json('"unterminated') is None
+    assert parse_partial_json("12") is None
+
+
+def test_truncated_string_value_is_left_out():
+    assert parse_partial_json('{"quality": "hd", "style": "viv') == {"quality": "hd"}
+
+
+def test_truncated_key_is_left_out():
+    assert parse_partial_json('{"quality": "hd", "sty') == {"quality": "hd"}
+    assert parse_partial_json('{"quality": "hd", "style"') == {"quality": "hd"}
+    assert parse_partial_json('{"quality": "hd", "style": ') == {"quality": "hd"}
+
+
+def test_truncated_array_item_is_left_out():
+    assert parse_partial_json('{"prompts": ["a cat", "a d') == {"prompts": ["a cat"]}
+    assert parse_partial_json('{"prompts": ["a cat", ') == {"prompts": ["a cat"]}
+
+
+def test_escapes():
+    assert parse_partial_json(r'{"a": "say \"hi\"", "b": "x') == {"a": 'say "hi"'}
+    assert parse_partial_json(r'{"a": "back\\slash"}') == {"a": "back\\slash"}
+    assert parse_partial_json(r'{"a": "café"}') == {"a": "café"}
+
+
+def test_escape_cut_mid_sequence_is_left_out():
+    # An escaped quote must not be taken for the closing one
+    assert parse_partial_json(r'{"a": "say \"') == {}
+    assert parse_partial_json('{"a": "say \\') == {}
+    assert parse_partial_json(r'{"a": "caf\u00') == {}
+
+
+def test_number_only_once_something_follows_it():
+    # 12 could still become 123
+    assert parse_partial_json('{"n": 12') == {}
+    assert parse_partial_json('{"n": 12,') == {"n": 12}
+    assert parse_partial_json('{"n": -1.5e3}') == {"n": -1500.0}
+    assert parse_partial_json("[1, 2") == [1]
+
+
+def test_truncated_literal_is_left_out():
+    assert parse_partial_json('{"ok": tr') == {}
+    assert parse_partial_json('{"ok": true') == {"ok": True}
+
+
+def test_nested_partial_containers_come_back_as_if_complete():
+    # Open objects and arrays are returned with whatever is final so far, so
+    # callers can't tell {} from an object still being written
+    assert parse_partial_json('{"a": [{"b": "c') == {"a": [{}]}
+    assert parse_partial_json('{"a": {"b": [1, ') == {"a": {"b": [1]}}
+    assert parse_partial_json('{"a": [') == {"a": []}
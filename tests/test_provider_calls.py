@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+from modules import provider_calls
+from modules.provider_calls import (
+    BATCH,
+    INTERACTIVE,
+    Admission,
+    CallAbandoned,
+    SingleFlight,
+    TokenBucket,
+    independent_calls,
+    provider_call,
+    rate_limit,
+    track_admission,
+)
+
+
+def wait_until(condition, timeout: float = 2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    # Fresh buckets, and only the limits the test sets
+    monkeypatch.setattr(provider_calls, "_buckets", {})
+    monkeypatch.setattr(provider_calls, "PROVIDER_RATE_LIMITS", {})
+    return provider_calls.PROVIDER_RATE_LIMITS
+
+
+def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=20, burst=2)
+    start_time = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    # Two from the burst, the third one token (1/20 s) later
+    assert 0.03 < time.monotonic() - start_time < 0.5
+
+
+def test_interactive_waiters_go_ahead_of_batch_waiters():
+    bucket = TokenBucket(rate=20, burst=1)
+    bucket.acquire()
+    order = []
+
+    def acquire(name, level):
+        bucket.acquire(level)
+        order.append(name)
+
+    batch = [
+        threading.Thread(target=acquire, args=(f"batch{i}", BATCH)) for i in range(2)
+    ]
+    for thread in batch:
+        thread.start()
+    wait_until(lambda: len(bucket._waiters) == 2)
+    interactive = threading.Thread(target=acquire, args=("interactive", INTERACTIVE))
+    interactive.start()
+
+    for thread in batch + [interactive]:
+        thread.join(timeout=2)
+    assert order == ["interactive", "batch0", "batch1"]
+
+
+def test_abandoned_waiter_leaves_without_a_token():
+    bucket = TokenBucket(rate=0.1, burst=1)
+    bucket.acquire()
+    abandoned = threading.Event()
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(bucket.acquire(INTERACTIVE, abandoned))
+    )
+    thread.start()
+    wait_until(lambda: bucket._waiters)
+
+    abandoned.set()
+    bucket.wake()
+    thread.join(timeout=2)
+
+    assert results == [False]
+    assert bucket._waiters == []
+
+
+def test_admission_reports_queueing_and_can_abandon(limits):
+    limits["slow"] = (0.1, 1)
+    rate_limit("slow", "model")
+    admission = Admission()
+    errors = []
+
+    def call():
+        with track_admission(admission):
+            try:
+                rate_limit("slow", "model")
+            except CallAbandoned as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    assert admission.queued.wait(2)
+    assert not admission.admitted.is_set()
+
+    admission.abandon()
+    thread.join(timeout=2)
+    assert len(errors) == 1
+
+
+def test_unlimited_calls_are_admitted_without_queueing(limits):
+    admission = Admission()
+    with track_admission(admission):
+        rate_limit("unlimited", "model")
+    assert admission.admitted.is_set()
+    assert not admission.queued.is_set()
+
+
+def test_model_limit_wins_over_provider_limit(limits):
+    limits["p"] = (1, 1)
+    limits["p:fast"] = (100, 100)
+    assert provider_calls._bucket("p", "fast").rate == 100
+    # Other models share the provider's bucket
+    assert provider_calls._bucket("p", "a") is provider_calls._bucket("p", "b")
+
+
+def test_single_flight_shares_concurrent_calls():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "result"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight.do("key", fn)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: calls)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert calls == [1]
+    assert results == ["result"] * 3
+
+
+def test_single_flight_doesnt_cache_finished_calls():
+    single_flight = SingleFlight()
+    calls = []
+    single_flight.do("key", lambda: calls.append(1))
+    single_flight.do("key", lambda: calls.append(1))
+    assert calls == [1, 1]
+
+
+def test_single_flight_shares_errors_and_forgets_them():
+    single_flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        single_flight.do("key", fail)
+    assert single_flight.do("key", lambda: "ok") == "ok"
+
+
+def test_independent_calls_skip_single_flight(limits):
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+
+    def call():
+        with independent_calls():
+            provider_call("p", "m", fn, key="same prompt")
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: len(calls) == 2)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
@@ -0,0 +1,177 @@
+import threading
+import time
+
+import pytest
+
+from modules import provider_calls, router
+from modules.hedging import LatencyTracker
+from modules.provider_calls import provider_call
+from modules.router import CircuitBreaker, Router
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    # Latencies and rate limits are process wide, keep tests from sharing them
+    monkeypatch.setattr(router, "latency_tracker", LatencyTracker())
+    monkeypatch.setattr(provider_calls, "_buckets", {})
+    monkeypatch.setattr(provider_calls, "PROVIDER_RATE_LIMITS", {})
+
+
+@pytest.fixture
+def release():
+    # Lets calls left hanging by a test finish
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def make_router(**kwargs) -> Router:
+    options = dict(timeouts={"llm": 0.2}, max_retries=0, backoff=0, explore_rate=0)
+    options.update(kwargs)
+    return Router(**options)
+
+
+def fail():
+    raise RuntimeError("down")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_fails_over_to_the_next_candidate():
+    r = make_router()
+    assert r.call("llm", [("a", fail), ("b", lambda: "b")]) == "b"
+    assert r.error_rate("a") == 1.0
+    assert r.error_rate("b") == 0.0
+
+
+def test_raises_when_every_candidate_fails():
+    with pytest.raises(RuntimeError, match="No llm backend succeeded"):
+        make_router(max_retries=1).call("llm", [("a", fail), ("b", fail)])
+
+
+def test_open_breaker_skips_the_candidate():
+    r = make_router(breaker_failures=1)
+    calls = []
+
+    def a():
+        calls.append(1)
+        raise RuntimeError("down")
+
+    r.call("llm", [("a", a), ("b", lambda: "b")])
+    r.call("llm", [("a", a), ("b", lambda: "b")])
+    assert calls == [1]
+
+
+def test_fastest_known_candidate_goes_first():
+    router.latency_tracker.record("a", 2.0)
+    router.latency_tracker.record("b", 0.1)
+    ordered = make_router().order([("a", None), ("b", None), ("c", None)])
+    # c has no history, it keeps its place after the known ones
+    assert [name for name, _ in ordered] == ["b", "a", "c"]
+
+
+def test_explore_puts_an_unknown_candidate_first():
+    router.latency_tracker.record("a", 0.1)
+    r = make_router(explore_rate=1.0)
+    assert r.order([("a", None), ("b", None)])[0][0] == "b"
+
+
+def test_slow_call_times_out_and_fails_over(release):
+    r = make_router()
+    result = r.call("llm", [("slow", lambda: release.wait(2)), ("b", lambda: "b")])
+    assert result == "b"
+    assert r.error_rate("slow") == 1.0
+
+
+def test_retries_send_a_new_request_each_time(release):
+    # Identical prompts share in-flight calls, but a retry must not join the
+    # attempt that just timed out
+    calls = []
+
+    def hung():
+        calls.append(1)
+        release.wait(2)
+
+    r = make_router(max_retries=2)
+    with pytest.raises(RuntimeError):
+        r.call("llm", [("a", lambda: provider_call("p", "m", hung, key="prompt"))])
+    assert len(calls) == 3
+
+
+def test_late_result_of_a_timed_out_call_is_discarded(release):
+    discarded = []
+    done = threading.Event()
+
+    def discard(result):
+        discarded.append(result)
+        done.set()
+
+    def slow():
+        release.wait(2)
+        return "late"
+
+    r = make_router()
+    assert r.call("llm", [("slow", slow), ("b", lambda: "b")], discard) == "b"
+    release.set()
+    assert done.wait(2)
+    assert discarded == ["late"]
+
+
+def test_rate_limiter_queueing_doesnt_count_towards_the_timeout():
+    provider_calls.PROVIDER_RATE_LIMITS["p"] = (5, 1)
+    provider_calls.rate_limit("p", "m")
+    r = make_router(timeouts={"llm": 0.5})
+
+    # Queued ~0.2s for a token, then 0.4s of call: over the timeout in total
+    def call():
+        return provider_call("p", "m", lambda: time.sleep(0.4) or "a")
+
+    assert r.call("llm", [("a", call), ("b", lambda: "b")]) == "a"
+
+
+def test_long_queue_fails_over_without_a_breaker_failure():
+    provider_calls.PROVIDER_RATE_LIMITS["p"] = (0.1, 1)
+    provider_calls.rate_limit("p", "m")
+    calls = []
+    r = make_router(max_retries=2)
+
+    def queued():
+        return provider_call("p", "m", lambda: calls.append(1))
+
+    assert r.call("llm", [("a", queued), ("b", lambda: "b")]) == "b"
+    assert r.breaker("a").consecutive_failures == 0
+    assert r.error_rate("a") == 0.0
+    # The abandoned call left the queue without ever running
+    time.sleep(0.05)
+    assert provider_calls._bucket("p", "m")._waiters == []
+    assert calls == []
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from modules.simple_llm import consensus, prompt_majority, prompt_many
+
+
+class FakeModel:
+    """
+    Stands in for an llm.Model: answers in turn from `answers`, after `delay`.
+    """
+
+    needs_key = None
+    # Calls still running, including ones a test stopped waiting for
+    running = 0
+    running_lock = threading.Lock()
+
+    def __init__(self, model_id, *answers, delay=0.0, error=None):
+        self.model_id = model_id
+        self.answers = list(answers)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def prompt(self, prompt_text):
+        with self._lock:
+            answer = ""
+            if self.answers:
+                answer = self.answers[self.calls % len(self.answers)]
+            self.calls += 1
+        with FakeModel.running_lock:
+            FakeModel.running += 1
+        return self._stream(answer)
+
+    def _stream(self, answer):
+        try:
+            time.sleep(self.delay)
+            if self.error:
+                raise self.error
+            # Streamed in chunks, like a real response
+            yield answer[: len(answer) // 2]
+            yield answer[len(answer) // 2 :]
+        finally:
+            with FakeModel.running_lock:
+                FakeModel.running -= 1
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(monkeypatch, tmp_path):
+    # Prompt spans get exported to TRACE_FILE, relative to the working directory,
+    # so let abandoned calls finish before leaving it
+    monkeypatch.chdir(tmp_path)
+    yield
+    deadline = time.time() + 5
+    while FakeModel.running and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def test_majority_of_normalized_answers():
+    models = [FakeModel("a", "Yes."), FakeModel("b", "no"), FakeModel("c", " yes")]
+    result = prompt_majority(models, "Is it?")
+    assert result.reached
+    assert result.answer.strip().lower().rstrip(".") == "yes"
+    assert sorted(r.model_id for r in result.agreeing) == ["a", "c"]
+
+
+def test_majority_returns_without_waiting_for_the_rest():
+    models = [
+        FakeModel("a", "4"),
+        FakeModel("b", "4"),
+        FakeModel("slow", "5", delay=1),
+    ]
+    start_time = time.time()
+    result = prompt_majority(models, "2 + 2?")
+    assert result.reached
+    assert time.time() - start_time < 0.5
+    assert "slow" not in [r.model_id for r in result.results]
+
+
+def test_no_majority_reports_the_most_common_answer():
+    models = [
+        FakeModel("a", "red"),
+        FakeModel("b", "blue"),
+        FakeModel("c", "blue"),
+        FakeModel("d", "green"),
+    ]
+    result = prompt_majority(models, "Color?")
+    assert not result.reached
+    assert result.answer == "blue"
+
+
+def test_errors_and_timeouts_never_agree():
+    models = [
+        FakeModel("a", "yes"),
+        FakeModel("broken", error=RuntimeError("down")),
+        FakeModel("slow", "yes", delay=0.5),
+    ]
+    result = prompt_majority(models, "Is it?", timeout={"slow": 0.1})
+    assert not result.reached
+    errors = {r.model_id: r.error for r in result.results if r.error}
+    assert "RuntimeError: down" == errors["broken"]
+    assert errors["slow"].startswith("Timed out")
+
+
+def test_sampling_one_model_repeatedly_makes_separate_calls():
+    model = FakeModel("m", "a", "b", "a", delay=0.1)
+    result = prompt_majority([model, model, model], "Pick one")
+    assert model.calls == 3
+    assert result.reached
+    assert result.answer == "a"
+    assert len(result.agreeing) == 2
+
+
+def test_custom_agreement_test():
+    models = [FakeModel("a", "42 apples"), FakeModel("b", "42 pears")]
+    result = prompt_majority(
+        models, "How many?", same_answer=lambda x, y: x.split()[0] == y.split()[0]
+    )
+    assert result.reached
+
+
+def test_first_k_returns_the_fastest_successes():
+    models = [
+        FakeModel("slow", "x", delay=0.5),
+        FakeModel("fast", "y"),
+        FakeModel("broken", error=RuntimeError("down")),
+    ]
+    results = prompt_many(models, "Hi", mode="first_k", k=1)
+    assert [r.model_id for r in results] == ["fast"]
+
+
+def test_consensus_of_results():
+    results = prompt_many(
+        [FakeModel("a", "Yes"), FakeModel("b", "yes."), FakeModel("c", "no")], "?"
+    )
+    assert consensus(results).lower().startswith("yes")